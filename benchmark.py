@@ -0,0 +1,264 @@
+"""滚动字幕性能基准测试
+
+在 Qt offscreen 平台上驱动 LyricLabel 的滚动和绘制，模拟 N 帧并统计每帧开销。
+N 帧分成几段，每段先跳到一个事件（新行进入、行切换、一轮结束折回）之前，
+计时的帧一定经过这些事件，而不是只测到第一行的一部分。
+以一组基准参数为中心，分别扫描行数、行长度、字体大小、速度和文字类型（包括带样式标记的行），
+每个用例在独立子进程中运行，峰值内存互不影响。结果保存为 JSON，可与之前的结果比较。
+
+    python benchmark.py                       # 完整扫描
+    python benchmark.py --quick               # 少量用例，快速检查
+    python benchmark.py --compare bench_results/上一次.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BASELINE = {'lines': 1000, 'length': 60, 'font_size': 40, 'speed': 120, 'script': 'mixed',
+            'frames': 600, 'fps': 60, 'width': 2500}
+SWEEPS = {
+    'lines': [10, 1000, 10000, 100000],
+    'length': [10, 60, 500, 3000],
+    'font_size': [20, 40, 70, 100],
+    'speed': [30, 120, 600],
+    'script': ['latin', 'cjk', 'mixed', 'emoji', 'styled'],
+}
+QUICK_SWEEPS = {
+    'lines': [10, 100000],
+    'font_size': [20, 100],
+    'script': ['latin', 'emoji'],
+}
+WORDS = {
+    'latin': ['Sponsor', 'welcome', 'to', 'the', 'stream', 'limited', 'offer', 'today', 'follow', 'like'],
+    'cjk': ['欢迎', '关注', '直播间', '点赞', '新品上架', '限时特价', '优惠券', '赞助商', '进群', '福利'],
+    'emoji': ['🎉', '🔥', '🎁', '⭐', '❤️', '👍', '🚀', '💰', '📢', '✨'],
+}
+WORDS['mixed'] = WORDS['latin'] + WORDS['cjk'] + WORDS['emoji'][:3]
+# 带样式标记的行（见 styled_text.py），与 mixed 比较可以看出样式片段是否增加每帧开销
+WORDS['styled'] = WORDS['mixed'] + ['[color=#ffcc00][b]赞助商[/b][/color]', '[color=#66ccff]限时特价[/color]',
+                                    '[b]Sponsor[/b]']
+REGRESSION_THRESHOLD = 0.15  # 每帧开销变慢超过15%视为退化（亚毫秒级计时本身有波动）
+
+
+def make_text_file(case):
+    """按用例生成确定的测试文本（固定随机种子，每次运行内容相同）"""
+    generator = random.Random(f"{case['lines']}-{case['length']}-{case['script']}")
+    words = WORDS[case['script']]
+    handle, path = tempfile.mkstemp(prefix='ticker_bench_', suffix='.txt')
+    with os.fdopen(handle, 'w', encoding='utf-8') as file:
+        for index in range(case['lines']):
+            line = str(index)
+            while len(line) < case['length']:
+                line += ' ' + generator.choice(words)
+            file.write(line[:case['length']] + '\n')
+    return path
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows 没有 resource 模块
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS 以字节为单位
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def event_times(label):
+    """计时段要经过的事件时间（秒）：开头、中间和最后一行开始渲染分块，第一行和中间一行离开，以及折回"""
+    timeline = label.timeline
+    count = len(timeline)
+    middle = count // 2
+    # 分块在行进入视口右侧的预取区域时渲染，比进入视口早 PREFETCH_WIDTH
+    prefetch = label.PREFETCH_WIDTH / label.speed
+    times = {timeline.enter_time(index, label.speed) - prefetch
+             for index in {min(1, count - 1), middle, count - 1}}
+    times |= {timeline.exit_time(index, label.speed) for index in {0, middle}}
+    times.add((timeline.cycle_length - timeline.origin()) / label.speed)
+    return sorted(times)
+
+
+def run_case(case):
+    """在当前进程中运行一个用例，返回结果字典"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication, QWidget
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtCore import Qt
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    sys.stdout = sys.stderr  # 被测代码的控制台输出不能混入结果
+    import main
+    path = make_text_file(case)
+    try:
+        container = QWidget()
+        label = main.LyricLabel(container)
+        label.frame_clock.timer.stop()
+        label.set_font_size(case['font_size'])
+        container.resize(case['width'], label.metrics_index.line_height + 10)
+        label.update_position()
+        label.set_speed(case['speed'])
+        load_started = time.perf_counter()
+        label.load_text_from_file(path)
+        label.text_lines.wait()
+        load_seconds = time.perf_counter() - load_started
+        # 排布整轮（不计时），才能跳到最后一行和折回处
+        layout_started = time.perf_counter()
+        label.ensure_layout(float('inf'))
+        layout_seconds = time.perf_counter() - layout_started
+        image = QImage(label.size(), QImage.Format_ARGB32_Premultiplied)
+        events = event_times(label)
+        window_frames = max(1, case['frames'] // len(events))
+        window_seconds = window_frames / case['fps']
+        switches = wraps = tiles = 0
+        costs = []
+        total = 0.0
+        for event in events:
+            # 跳到事件之前半段的位置，事件发生在这一段计时的中间
+            start = max(0.0, event - window_seconds / 2)
+            label.seek(start)
+            label.scroll_text(start)
+            # 跳转本身也会切换行、渲染分块，只统计计时帧中的
+            counters = label.line_switches, label.wraps, label.pixmap_cache.misses
+            started = time.perf_counter()
+            for frame in range(1, window_frames + 1):
+                frame_started = time.perf_counter()
+                label.scroll_text(start + frame / case['fps'])
+                image.fill(Qt.transparent)
+                painter = QPainter(image)
+                label.paint_content(painter)
+                painter.end()
+                costs.append((time.perf_counter() - frame_started) * 1000)
+            total += time.perf_counter() - started
+            switches += label.line_switches - counters[0]
+            wraps += label.wraps - counters[1]
+            tiles += label.pixmap_cache.misses - counters[2]
+        costs.sort()
+        return {
+            'case': case,
+            'fps': round(len(costs) / total, 1),
+            'frame_ms_p50': round(percentile(costs, 0.5), 4),
+            'frame_ms_p99': round(percentile(costs, 0.99), 4),
+            'frame_ms_max': round(costs[-1], 4),
+            'load_ms': round(load_seconds * 1000, 2),
+            'layout_ms': round(layout_seconds * 1000, 2),
+            # 计时帧中经过的行切换、折回次数和新渲染的分块数，确认各段确实经过了这些事件
+            'line_switches': switches,
+            'wraps': wraps,
+            'tiles_rendered': tiles,
+            'peak_rss_kb': peak_rss_kb(),
+        }
+    finally:
+        if hasattr(label.text_lines, 'close'):
+            label.text_lines.close()
+        os.remove(path)
+
+
+def case_name(case):
+    return ' '.join(f'{key}={case[key]}' for key in ('lines', 'length', 'font_size', 'speed', 'script'))
+
+
+def build_cases(sweeps, frames):
+    cases = []
+    seen = set()
+    for key, values in sweeps.items():
+        for value in values:
+            case = dict(BASELINE, frames=frames, **{key: value})
+            name = case_name(case)
+            if name not in seen:
+                seen.add(name)
+                cases.append(case)
+    return cases
+
+
+def run_in_subprocess(case):
+    """在子进程中运行一个用例；失败时输出子进程的错误信息并返回 None"""
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', json.dumps(case)],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if completed.returncode != 0:
+        sys.stderr.write(f"用例失败（退出码 {completed.returncode}）: {case_name(case)}\n")
+        sys.stderr.write(completed.stderr.decode('utf-8', errors='replace')[-4000:])
+        return None
+    return json.loads(completed.stdout)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, previous_path, threshold=REGRESSION_THRESHOLD):
+    """与之前保存的结果逐个用例比较 p50 每帧开销，返回是否存在退化"""
+    with open(previous_path, encoding='utf-8') as file:
+        previous = {case_name(result['case']): result for result in json.load(file)['results']}
+    regressed = False
+    print(f'\n与 {previous_path} 比较（p50 每帧开销）:')
+    for result in results:
+        name = case_name(result['case'])
+        old = previous.get(name)
+        if not old:
+            continue
+        change = (result['frame_ms_p50'] - old['frame_ms_p50']) / max(old['frame_ms_p50'], 1e-9)
+        flag = ''
+        if change > threshold:
+            flag = '  <-- 退化'
+            regressed = True
+        print(f"  {name}: {old['frame_ms_p50']:.4f} -> {result['frame_ms_p50']:.4f} ms ({change:+.1%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='滚动字幕性能基准测试')
+    parser.add_argument('--quick', action='store_true', help='只运行少量用例')
+    parser.add_argument('--frames', type=int, default=BASELINE['frames'], help='每个用例模拟的帧数')
+    parser.add_argument('--output', default=None, help='结果文件路径，默认保存到 bench_results/ 目录')
+    parser.add_argument('--compare', metavar='PREVIOUS', help='与之前的结果文件比较，发现退化时返回非零')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help='判定退化的变慢比例')
+    parser.add_argument('--case', help=argparse.SUPPRESS)  # 子进程内部使用
+    args = parser.parse_args()
+    if args.case:
+        result = run_case(json.loads(args.case))
+        sys.__stdout__.write(json.dumps(result))
+        return 0
+    cases = build_cases(QUICK_SWEEPS if args.quick else SWEEPS, args.frames)
+    results = []
+    failed = 0
+    print(f"{'用例':<64}{'FPS':>10}{'p50 ms':>10}{'p99 ms':>10}{'切换':>6}{'折回':>6}{'峰值内存KB':>12}")
+    for case in cases:
+        result = run_in_subprocess(case)
+        if result is None:
+            failed += 1
+            continue
+        results.append(result)
+        print(f"{case_name(case):<64}{result['fps']:>10}{result['frame_ms_p50']:>10}"
+              f"{result['frame_ms_p99']:>10}{result['line_switches']:>6}{result['wraps']:>6}"
+              f"{str(result['peak_rss_kb']):>12}")
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'processor': platform.processor() or platform.machine()},
+        'results': results,
+    }
+    output = args.output or os.path.join('bench_results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f'\n结果已保存到 {output}')
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
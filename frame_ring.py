@@ -0,0 +1,263 @@
+"""共享内存帧环形缓冲区
+
+滚动字幕每渲染一帧（带透明通道）就写入一个内存映射文件中的环形缓冲区，
+本机任何进程都可以直接从映射中读取帧，不需要窗口捕获。本模块不依赖 Qt。
+
+文件布局（小端）：
+    文件头 64 字节：magic, version, slot_count, max_width, max_height, max_stride,
+                   pixel_format, slot_size, latest（最新一帧的帧号 + 1，0 表示还没有帧）
+    之后是 slot_count 个槽位，每个槽位先是 64 字节的槽位头：
+                   sequence, frame_index, timestamp, width, height, stride
+                   然后是 stride * height 字节的像素数据
+
+每个槽位用顺序锁防止读到写了一半的帧：写入前 sequence 变为奇数（最低位置 1），
+写完后再加一变为偶数。读取方在读数据前后各读一次 sequence，两次相同且为偶数才有效。
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+MAGIC = b'TKRB'
+VERSION = 1
+FORMAT_BGRA_PREMULTIPLIED = 1  # 每像素 B, G, R, A 四个字节，颜色已预乘 alpha
+
+FILE_HEADER = struct.Struct('<4sIIIIIIIQ')
+FILE_HEADER_SIZE = 64
+LATEST_OFFSET = FILE_HEADER.size - 8
+SLOT_HEADER = struct.Struct('<QQdIII')
+SLOT_HEADER_SIZE = 64
+SEQUENCE = struct.Struct('<Q')
+
+Frame = namedtuple('Frame', 'index timestamp width height stride data sequence slot')
+
+
+def default_path():
+    """默认放在内存文件系统中（Linux 的 /dev/shm），没有时放在临时目录"""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'ticker_frames.ring')
+
+
+class FrameRingWriter:
+    """写入方：按帧号轮流写入各个槽位"""
+    def __init__(self, path, max_width, max_height, slot_count=4, pixel_format=FORMAT_BGRA_PREMULTIPLIED):
+        self.path = path
+        self.max_width = max_width
+        self.max_height = max_height
+        self.max_stride = max_width * 4
+        self.slot_count = slot_count
+        # 槽位按64字节对齐
+        self.slot_size = (SLOT_HEADER_SIZE + self.max_stride * max_height + 63) // 64 * 64
+        self.frame_index = 0
+        size = FILE_HEADER_SIZE + self.slot_size * slot_count
+        # 不先截断为0，已经映射了该文件的读取方不会因此访问越界
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        header = self._file.read(FILE_HEADER.size)
+        if len(header) == FILE_HEADER.size:
+            (magic, version, old_slot_count, old_width, old_height, _, old_format, old_slot_size,
+             latest) = FILE_HEADER.unpack(header)
+            if (magic, version, old_slot_count, old_width, old_height, old_format, old_slot_size) == (
+                    MAGIC, VERSION, slot_count, max_width, max_height, pixel_format, self.slot_size):
+                # 崩溃后重启的写入方接着原来的帧号写，仍在读取的读取方不需要重新打开
+                self.frame_index = latest
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        FILE_HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, slot_count, max_width, max_height,
+                              self.max_stride, pixel_format, self.slot_size, self.frame_index)
+
+    def write(self, data, width, height, stride, timestamp=None):
+        """写入一帧；超出容量的部分被裁掉。返回这一帧的帧号"""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        width = min(width, self.max_width)
+        height = min(height, self.max_height)
+        frame_index = self.frame_index
+        offset = FILE_HEADER_SIZE + (frame_index % self.slot_count) * self.slot_size
+        # 奇数表示正在写入；上一个写入方在写入中途崩溃时 sequence 停在奇数，置位而不是加一，写入期间仍为奇数
+        writing = SEQUENCE.unpack_from(self._mmap, offset)[0] | 1
+        SEQUENCE.pack_into(self._mmap, offset, writing)
+        data_offset = offset + SLOT_HEADER_SIZE
+        row_bytes = width * 4
+        if stride == row_bytes:
+            self._mmap[data_offset:data_offset + row_bytes * height] = data[:row_bytes * height]
+        else:
+            for row in range(height):
+                source = row * stride
+                target = data_offset + row * row_bytes
+                self._mmap[target:target + row_bytes] = data[source:source + row_bytes]
+        SLOT_HEADER.pack_into(self._mmap, offset, writing, frame_index, timestamp, width, height, row_bytes)
+        SEQUENCE.pack_into(self._mmap, offset, writing + 1)
+        struct.pack_into('<Q', self._mmap, LATEST_OFFSET, frame_index + 1)
+        self.frame_index += 1
+        return frame_index
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class FrameRingReader:
+    """参考读取方：可以取最新一帧，也可以按顺序逐帧读取"""
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.slot_count, self.max_width, self.max_height, self.max_stride,
+         self.pixel_format, self.slot_size, _) = FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'不是帧环形缓冲区文件: {path}')
+        self.next_index = 0  # 顺序读取时下一帧的帧号
+        self.dropped = 0  # 顺序读取时因写入方套圈而跳过的帧数
+        self.torn = 0  # 读取期间被写入方覆盖而重试的次数
+
+    def latest_index(self):
+        """最新一帧的帧号，没有帧时为 -1"""
+        return struct.unpack_from('<Q', self._mmap, LATEST_OFFSET)[0] - 1
+
+    def read(self, frame_index, copy=True):
+        """读取指定帧号的帧；该帧已被覆盖或正在写入时返回 None
+
+        copy=False 时 data 是映射上的 memoryview（零拷贝），使用完后需调用 is_valid() 确认
+        期间没有被写入方覆盖。
+        """
+        offset = FILE_HEADER_SIZE + (frame_index % self.slot_count) * self.slot_size
+        sequence, index, timestamp, width, height, stride = SLOT_HEADER.unpack_from(self._mmap, offset)
+        if sequence % 2 or index != frame_index:
+            return None
+        data_offset = offset + SLOT_HEADER_SIZE
+        view = memoryview(self._mmap)[data_offset:data_offset + stride * height]
+        data = bytes(view) if copy else view
+        frame = Frame(index, timestamp, width, height, stride, data, sequence, offset)
+        if copy and not self.is_valid(frame):
+            self.torn += 1
+            return None
+        return frame
+
+    def is_valid(self, frame):
+        """帧数据读取期间槽位没有被改写"""
+        return SEQUENCE.unpack_from(self._mmap, frame.slot)[0] == frame.sequence
+
+    def read_latest(self, copy=True):
+        while True:
+            latest = self.latest_index()
+            if latest < 0:
+                return None
+            frame = self.read(latest, copy)
+            if frame is not None:
+                return frame
+
+    def read_next(self, copy=True):
+        """按顺序读取下一帧，还没有新帧时返回 None；写入方套圈时跳到仍可读取的最早一帧"""
+        while True:
+            latest = self.latest_index()
+            if latest + 1 < self.next_index:
+                # 帧号变小：写入方以不同的布局重新开始，从头读取
+                self.next_index = 0
+            if latest < self.next_index:
+                return None
+            oldest = max(0, latest - self.slot_count + 2)  # 留一个槽位给可能正在写入的帧
+            if self.next_index < oldest:
+                self.dropped += oldest - self.next_index
+                self.next_index = oldest
+            frame = self.read(self.next_index, copy)
+            if frame is not None:
+                self.next_index += 1
+                return frame
+            self.next_index += 1
+            self.dropped += 1
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+def _self_test_writer(path, width, height, frame_count):
+    writer = FrameRingWriter(path, width, height, slot_count=3)
+    for _ in range(frame_count):
+        # 整帧填充同一个字节值，读到混合的值即说明读到了写了一半的帧
+        writer.write(bytes([writer.frame_index % 251]) * (width * 4 * height), width, height, width * 4)
+    writer.close()
+
+
+def _crashed_writer(path, width, height):
+    """建好文件并模拟写入方在写入中途崩溃：每个槽位的 sequence 停在奇数"""
+    writer = FrameRingWriter(path, width, height, slot_count=3)
+    for slot in range(writer.slot_count):
+        offset = FILE_HEADER_SIZE + slot * writer.slot_size
+        SEQUENCE.pack_into(writer._mmap, offset, 2 * slot + 1)
+    writer.close()
+
+
+def self_test(frame_count=5000, width=1920, height=128):
+    """用写入子进程和读取方检查帧号递增且没有读到写了一半的帧
+
+    写入子进程是崩溃后重启的写入方，写完一半后再重启一次，读取方保持打开，应当继续读到后一半的帧。
+    """
+    import multiprocessing
+    path = os.path.join(tempfile.gettempdir(), f'ticker_frames_selftest_{os.getpid()}.ring')
+    # 先建好文件，读取方可以立即打开
+    _crashed_writer(path, width, height)
+    reader = FrameRingReader(path)
+    received = 0
+    last_index = -1
+    errors = []
+    processes = [multiprocessing.Process(target=_self_test_writer, args=(path, width, height, count))
+                 for count in (frame_count // 2, frame_count - frame_count // 2)]
+    processes[0].start()
+    while (processes[1].pid is None or processes[1].is_alive()
+           or reader.latest_index() >= reader.next_index):
+        if not processes[0].is_alive() and processes[1].pid is None:
+            processes[1].start()
+        frame = reader.read_next()
+        if frame is None:
+            continue
+        if frame.index <= last_index:
+            errors.append(f'帧号没有递增: {last_index} -> {frame.index}')
+        expected = frame.index % 251
+        if frame.data.count(expected) != len(frame.data):
+            errors.append(f'第 {frame.index} 帧内容不一致（读到写了一半的帧）')
+        last_index = frame.index
+        received += 1
+    for process in processes:
+        process.join()
+    reader.close()
+    os.remove(path)
+    if not received:
+        errors.append('没有读到任何帧（重启后的写入方写完的帧仍被当作正在写入）')
+    elif last_index < frame_count - 1:
+        errors.append(f'最后读到第 {last_index} 帧，没有读到写入方重启后的帧')
+    print(f'写入 {frame_count} 帧，读取 {received} 帧，跳过 {reader.dropped} 帧，重试 {reader.torn} 次，'
+          f'错误 {len(errors)} 个')
+    for error in errors[:10]:
+        print(error)
+    return not errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='共享内存帧环形缓冲区参考读取程序')
+    parser.add_argument('path', nargs='?', default=default_path())
+    parser.add_argument('--self-test', action='store_true', help='检查帧顺序和读取时没有撕裂')
+    args = parser.parse_args()
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    reader = FrameRingReader(args.path)
+    started = time.monotonic()
+    received = 0
+    try:
+        while True:
+            frame = reader.read_next()
+            if frame is None:
+                time.sleep(0.001)
+                continue
+            received += 1
+            if received % 60 == 0:
+                elapsed = time.monotonic() - started
+                print(f'第 {frame.index} 帧 {frame.width}x{frame.height} 时间戳 {frame.timestamp:.3f}，'
+                      f'平均 {received / elapsed:.1f} FPS，跳过 {reader.dropped} 帧')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
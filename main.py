@@ -1,14 +1,705 @@
+import time
+PROCESS_STARTED = time.perf_counter()  # 用于统计启动耗时（到第一帧滚动文字），在导入 PyQt5 之前记录
 import sys
-import traceback
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QLabel, QWidget, 
-                           QVBoxLayout, QHBoxLayout, QPushButton, QSlider, 
+                           QVBoxLayout, QHBoxLayout, QPushButton, QSlider, QComboBox,
                            QFileDialog, QColorDialog, QFontDialog, QMessageBox, QSizePolicy)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QColor, QIcon
+from PyQt5.QtCore import (Qt, QEvent, QTimer, QPoint, QPointF, QRect, QObject, QBuffer,
+                          QFileSystemWatcher, QRunnable, QThreadPool, pyqtSignal)
+from PyQt5.QtGui import (QFont, QColor, QIcon, QImage, QPixmap, QPainter, QFontMetrics, QStaticText,
+                         QTransform)
+from collections import OrderedDict, deque, namedtuple
+from array import array
+from bisect import bisect_right
+import argparse
+import json
+import logging
+import math
+import mmap
 import os
+import queue
+import socketserver
+import tempfile
+import threading
+from difflib import SequenceMatcher
+import frame_ring
+from frame_ring import FrameRingWriter
+from scroll_timeline import ScrollTimeline
+import scroll_sync
+import rotation
+import startup_profile
+import styled_text
+import ticker_log
+
+log = logging.getLogger('ticker')
+
+class PixmapCache:
+    """按字节数限制容量的LRU缓存，保存文本行预渲染好的分块位图"""
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes  # 缓存总容量上限（字节）
+        self.current_bytes = 0
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._retained = {}  # 共享缓存的各个使用者（字幕轨道）当前需要保留的键
+
+    def get(self, key):
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            # 命中后移到队尾，表示最近使用
+            self._items.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return pixmap
+
+    def put(self, key, pixmap):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.current_bytes -= self.pixmap_bytes(old)
+        self._items[key] = pixmap
+        self.current_bytes += self.pixmap_bytes(pixmap)
+        # 超出容量时从最久未使用的一端开始淘汰，但至少保留刚放入的一项
+        while self.current_bytes > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self.current_bytes -= self.pixmap_bytes(evicted)
+
+    def retain(self, keys, owner=None):
+        """只保留给定的键，其余全部释放；多条轨道共享缓存时保留所有轨道所需键的并集"""
+        self._retained[owner] = keys
+        if len(self._retained) > 1:
+            keys = set().union(*self._retained.values())
+        for key in [key for key in self._items if key not in keys]:
+            self.current_bytes -= self.pixmap_bytes(self._items.pop(key))
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+class RollingHistogram:
+    """保存最近若干个样本（毫秒），需要时才计算分位数和分桶计数"""
+    BUCKETS_MS = (1, 2, 4, 8, 16, 33, 50, 100, 250)
+
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def summary(self):
+        values = sorted(self.samples)
+        if not values:
+            return {'count': 0}
+        def percentile(fraction):
+            return round(values[min(len(values) - 1, int(fraction * len(values)))], 3)
+        buckets = {}
+        start = 0
+        for edge in self.BUCKETS_MS:
+            stop = bisect_right(values, edge)
+            buckets[f'<={edge}'] = stop - start
+            start = stop
+        buckets[f'>{self.BUCKETS_MS[-1]}'] = len(values) - start
+        return {'count': len(values), 'mean': round(sum(values) / len(values), 3),
+                'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99),
+                'max': round(values[-1], 3), 'buckets': buckets}
+
+class FrameStats:
+    """帧时间统计：实际帧间隔、滚动和绘制耗时、迟到和丢弃的帧、循环衔接次数、缓存命中率
+
+    未启用时 LyricLabel.stats 为 None，滚动和绘制路径上只多一次判断。
+    """
+    def __init__(self, dump_path=None, dump_interval=5.0):
+        self.tick_interval = RollingHistogram()  # 实际帧间隔（毫秒）
+        self.scroll_time = RollingHistogram()  # 每帧滚动逻辑耗时（毫秒）
+        self.paint_time = RollingHistogram()  # 每帧绘制耗时（毫秒）
+        self.frames = 0
+        self.late_frames = 0  # 帧间隔超过目标间隔1.5倍的帧
+        self.dropped_frames = 0  # 按目标帧率推算被跳过的帧
+        self.wraps = 0  # 最后一行与第一行衔接、开始新一轮的次数
+        self.target_interval = 0.0
+        self.last_tick = None
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.last_dump = None
+        self.overlay_text = ''
+        self.overlay_updated = None
+        self.clock_mode = 'active'  # 帧时钟的节能模式：active、throttled 或 idle
+        self.startup_ms = None  # 从进程启动到第一帧滚动文字的耗时
+
+    def record_tick(self, now, target_interval, scroll_seconds):
+        self.frames += 1
+        self.target_interval = target_interval
+        self.scroll_time.add(scroll_seconds * 1000)
+        if self.last_tick is not None:
+            interval = now - self.last_tick
+            self.tick_interval.add(interval * 1000)
+            if interval > target_interval * 1.5:
+                self.late_frames += 1
+                self.dropped_frames += max(0, int(interval / target_interval + 0.5) - 1)
+        self.last_tick = now
+
+    def record_paint(self, seconds):
+        self.paint_time.add(seconds * 1000)
+
+    def snapshot(self, cache):
+        lookups = cache.hits + cache.misses
+        return {
+            'time': time.time(),
+            'frames': self.frames,
+            'target_interval_ms': round(self.target_interval * 1000, 3),
+            'late_frames': self.late_frames,
+            'dropped_frames': self.dropped_frames,
+            'wraps': self.wraps,
+            'clock_mode': self.clock_mode,
+            'startup_ms': self.startup_ms,
+            'tick_interval_ms': self.tick_interval.summary(),
+            'scroll_ms': self.scroll_time.summary(),
+            'paint_ms': self.paint_time.summary(),
+            'cache': {'hits': cache.hits, 'misses': cache.misses,
+                      'hit_rate': round(cache.hits / lookups, 4) if lookups else None,
+                      'items': len(cache), 'bytes': cache.current_bytes},
+        }
+
+    def maybe_dump(self, now, cache, force=False):
+        """按间隔把统计写入JSON文件（先写临时文件再替换，读取方不会读到半个文件）"""
+        if not self.dump_path:
+            return
+        if self.last_dump is None:
+            self.last_dump = now
+        if now - self.last_dump < self.dump_interval and not force:
+            return
+        self.last_dump = now
+        temp_path = self.dump_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(cache), file, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.dump_path)
+
+    def overlay(self, now, cache):
+        """调试叠加层显示的文字，每半秒更新一次"""
+        if self.overlay_updated is None or now - self.overlay_updated >= 0.5:
+            self.overlay_updated = now
+            interval = self.tick_interval.summary()
+            paint = self.paint_time.summary()
+            scroll = self.scroll_time.summary()
+            lookups = cache.hits + cache.misses
+            hit_rate = f'{cache.hits / lookups:.1%}' if lookups else '-'
+            self.overlay_text = (
+                f"帧间隔 p50 {interval.get('p50', 0)}ms p99 {interval.get('p99', 0)}ms | "
+                f"滚动 p99 {scroll.get('p99', 0)}ms | 绘制 p99 {paint.get('p99', 0)}ms | "
+                f"迟到 {self.late_frames} 丢帧 {self.dropped_frames} | 循环 {self.wraps} | 时钟 {self.clock_mode} | "
+                f"缓存命中 {hit_rate} {cache.current_bytes // 1024}KB")
+        return self.overlay_text
+
+# 排版好的样式片段：QStaticText、片段使用的字体、宽度、行高和上升高度
+RunLayout = namedtuple('RunLayout', 'static_text font width height ascent')
+
+class RunLayoutCache:
+    """样式片段的排版缓存：每个（文字, 粗体, 字体族）片段只排版一次，保存为 QStaticText
+
+    颜色不影响排版，修改某个片段的颜色不会让它重新排版；只有该片段的文字、粗体或字体变化时才会未命中。
+    每种字体一个缓存，字体变化时整体替换。
+    """
+    MAX_ITEMS = 4096
+
+    def __init__(self, font):
+        self.font = font
+        metrics = QFontMetrics(font)
+        self.line_height = metrics.height()
+        self.ascent = metrics.ascent()
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, run):
+        key = (run.text, run.bold, run.family)
+        layout = self.items.get(key)
+        if layout is not None:
+            self.hits += 1
+            self.items.move_to_end(key)
+            return layout
+        self.misses += 1
+        font = QFont(self.font)
+        if run.bold:
+            font.setBold(True)
+        if run.family:
+            font.setFamily(run.family)
+        static_text = QStaticText(run.text)
+        static_text.setTextFormat(Qt.PlainText)
+        static_text.prepare(QTransform(), font)
+        metrics = QFontMetrics(font)
+        layout = RunLayout(static_text, font, static_text.size().width(), metrics.height(), metrics.ascent())
+        self.items[key] = layout
+        if len(self.items) > self.MAX_ITEMS:
+            self.items.popitem(last=False)
+        return layout
+
+class TextMetricsIndex:
+    """按字体批量测量文本行的宽高，结果保存在紧凑数组中
+
+    字体变化时清空重建；行数很多时按滚动进度分批测量，已测量的行不会重复测量。
+    轮播模式下按调度器选中的顺序逐条测量，结果保存在按行号索引的字典中。
+    """
+    def __init__(self):
+        self.widths = array('i')  # 每行文本的像素宽度
+        self.heights = array('i')  # 每行文本的实际绘制高度
+        self.picked = {}  # 轮播模式下单独测量的行：行号 -> (宽度, 高度)
+        self.line_height = 0  # 字体的行高（包括上升和下降部分）
+        self.font_key = None
+        self.metrics = None
+        self.layouts = None  # 带样式标记的行按片段排版，测量和绘制共用
+
+    def reset(self, font):
+        """字体变化时清空索引"""
+        self.metrics = QFontMetrics(font)
+        self.layouts = RunLayoutCache(font)
+        self.line_height = self.metrics.height()
+        self.widths = array('i')
+        self.heights = array('i')
+        self.picked = {}
+        self.font_key = font.key()
+
+    def measure_until(self, lines, count):
+        """批量测量尚未测量的行，直到索引覆盖前count行"""
+        start = len(self.widths)
+        if count <= start:
+            return
+        for index in range(start, count):
+            width, height = self.measure_line(lines[index])
+            self.widths.append(width)
+            self.heights.append(height)
+
+    def measure_index(self, lines, index):
+        """单独测量某一行（轮播模式下选中时才测量），返回宽度；已测量的行直接返回"""
+        if index < len(self.widths):
+            return self.widths[index]
+        metrics = self.picked.get(index)
+        if metrics is None:
+            metrics = self.picked[index] = self.measure_line(lines[index])
+        return metrics[0]
+
+    def remap(self, old_lines, positions):
+        """目录替换后按文本把已测量的行换算到新行号，文本不变的广告不重新测量"""
+        picked = {}
+        for index in range(len(self.widths)):
+            new_index = positions.get(old_lines[index])
+            if new_index is not None:
+                picked[new_index] = (self.widths[index], self.heights[index])
+        for index, metrics in self.picked.items():
+            new_index = positions.get(old_lines[index])
+            if new_index is not None:
+                picked[new_index] = metrics
+        self.widths = array('i')
+        self.heights = array('i')
+        self.picked = picked
+
+    def shape(self, line):
+        """确保一行的片段排版仍在缓存中（被淘汰时重新排版），不改变测量结果"""
+        for run in styled_text.line_runs(line):
+            self.layouts.get(run)
+
+    def measure_line(self, line):
+        """一行的 (宽度, 高度)；带样式标记的行按各片段的字体排版测量，片段排版结果留作绘制"""
+        if not styled_text.has_markup(line):
+            return self.metrics.width(line), max(self.line_height, self.metrics.boundingRect(line).height())
+        width = 0.0
+        height = self.line_height
+        for run in styled_text.parse_runs(line):
+            layout = self.layouts.get(run)
+            width += layout.width
+            height = max(height, layout.height)
+        return math.ceil(width), height
+
+    def apply_diff(self, opcodes, lines):
+        """按差异结果重排测量结果：未变化的行沿用原来的宽高，只测量新增或修改的行
+
+        opcodes 与 difflib.SequenceMatcher.get_opcodes() 格式相同，lines 为新的文本行。
+        原来尚未测量的部分保持未测量，滚动到时再测量。
+        """
+        self.widths, self.heights = self.diffed(opcodes, lines.__getitem__, self)
+
+    def diffed(self, opcodes, get_line, measurer):
+        """按差异结果得到新的 (宽度数组, 高度数组)，不修改索引
+
+        新增或修改的行由 measurer 测量；在后台线程中准备时传入另一个同字体的索引，不使用界面线程的排版缓存。
+        """
+        measured = len(self.widths)
+        widths = array('i')
+        heights = array('i')
+        for tag, i1, i2, j1, j2 in opcodes:
+            if len(widths) != j1 or i1 > measured:
+                break
+            if tag == 'equal':
+                stop = min(i2, measured)
+                widths.extend(self.widths[i1:stop])
+                heights.extend(self.heights[i1:stop])
+                if stop < i2:
+                    break
+            else:
+                for index in range(j1, j2):
+                    width, height = measurer.measure_line(get_line(index))
+                    widths.append(width)
+                    heights.append(height)
+        return widths, heights
+
+    def install(self, widths, heights, cached_lines, line_count):
+        """使用预热缓存中同一字体、同一文件内容的测量结果，其余行滚动到时再测量
+
+        缓存保存时的行数与文件当前的行数不符时不使用，返回是否已使用。
+        """
+        if cached_lines != line_count or len(widths) > line_count or len(heights) != len(widths):
+            return False
+        if len(widths) <= len(self.widths):
+            return False  # 读取缓存前已经测量了更多行
+        self.widths = widths
+        self.heights = heights
+        return True
+
+    def rebuild(self, lines, font):
+        """字体或文本内容变化时整体重建索引"""
+        self.reset(font)
+        self.measure_until(lines, len(lines))
+
+    def width(self, index):
+        if 0 <= index < len(self.widths):
+            return self.widths[index]
+        metrics = self.picked.get(index)
+        return metrics[0] if metrics else 0
+
+    def height(self, index):
+        if 0 <= index < len(self.heights):
+            return self.heights[index]
+        metrics = self.picked.get(index)
+        return metrics[1] if metrics else self.line_height
+
+    def __len__(self):
+        return len(self.widths)
+
+class MappedTextFile:
+    """内存映射方式加载的大型文本文件
+
+    后台线程在映射上扫描换行符，建立每行起始偏移的索引；行内容在滚动到时才解码，
+    并预读后面的几行。索引尚未建完时即可读取已经索引到的行。
+    映射的是文件的临时快照，运营人员直播中编辑原文件不会改动或锁住正在读取的内容。
+    快照也由后台线程复制（同时计算内容键），是匿名临时文件，进程退出或崩溃后由系统删除。
+    """
+    COPY_CHUNK = 1024 * 1024  # 复制快照时每次读取的字节数
+    INDEX_CHUNK = 256 * 1024  # 后台线程每批扫描的字节数
+    READ_AHEAD = 32  # 解码某一行时顺带解码其后的行数
+    MAX_DECODED = 1024  # 最多保留的已解码行数
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.done = False  # 索引是否已建完
+        self.copied = False  # 快照是否已复制完
+        self.content_key = None  # 快照内容的 (哈希, 行数)，复制完后可用
+        self.index_time = 0.0  # 复制快照和建立索引耗时（秒）
+        self._starts = array('q', [0])  # 每行在文件中的起始偏移
+        self._decoded = OrderedDict()
+        self._stop = False
+        self.size = 0
+        self._mmap = None
+        # 原文件在这里打开，不存在时直接报错；复制在后台线程中进行
+        self._source = open(file_path, 'rb')
+        self._file = tempfile.TemporaryFile(prefix='ticker_', suffix='.txt')
+        self._thread = threading.Thread(target=self._build_index, daemon=True)
+        self._thread.start()
+
+    def _copy(self):
+        """把原文件复制到快照并计算内容键，然后映射快照"""
+        key = startup_profile.ContentKey()
+        with self._source:
+            for chunk in iter(lambda: self._source.read(self.COPY_CHUNK), b''):
+                if self._stop:
+                    return
+                self._file.write(chunk)
+                key.update(chunk)
+        self._file.flush()
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.size = size
+        self.content_key = key.result()
+        self.copied = True
+
+    def _build_index(self):
+        started = time.perf_counter()
+        try:
+            self._copy()
+            position = 0
+            while position < self.size and not self._stop:
+                chunk_end = min(self.size, position + self.INDEX_CHUNK)
+                batch = array('q')
+                found = self._mmap.find(b'\n', position, chunk_end)
+                while found != -1:
+                    batch.append(found + 1)
+                    found = self._mmap.find(b'\n', found + 1, chunk_end)
+                self._starts.extend(batch)
+                position = chunk_end
+        except Exception as e:
+            log.error(f"建立行索引错误: {str(e)}")
+        self.index_time = time.perf_counter() - started
+        self.done = True
+        if not self._stop:
+            log.info(f"加载了 {len(self)} 行文本，索引耗时 {self.index_time * 1000:.1f} ms，"
+                  f"常驻内存 {self.resident_bytes() / 1024:.1f} KB")
+
+    def __len__(self):
+        count = len(self._starts)
+        if self.done:
+            # 以换行结尾的文件最后一个偏移指向文件末尾，不是新的一行
+            return count - 1 if self._starts[-1] >= self.size else count
+        return count - 1  # 最后一个偏移所在的行还没有找到结尾
+
+    def __getitem__(self, index):
+        text = self._decoded.get(index)
+        if text is None:
+            if not 0 <= index < len(self):
+                raise IndexError(index)
+            # 解码这一行及其后的若干行，滚动到时直接命中
+            for line in range(index, min(len(self), index + self.READ_AHEAD)):
+                if line not in self._decoded:
+                    self._decoded[line] = self._decode(line)
+            while len(self._decoded) > self.MAX_DECODED:
+                self._decoded.popitem(last=False)
+            text = self._decoded[index]
+        return text
+
+    def raw(self, index):
+        """某一行未解码的原始字节（去掉首尾空白），用于快速比较内容"""
+        start = self._starts[index]
+        end = self._starts[index + 1] if index + 1 < len(self._starts) else self.size
+        return self._mmap[start:end].strip()
+
+    def _decode(self, index):
+        return self.raw(index).decode('utf-8', errors='replace').strip()
+
+    def wait(self):
+        """等待行索引建完"""
+        self._thread.join()
+
+    def resident_bytes(self):
+        """索引和已解码行占用的内存（不含由系统按需换入的映射页）"""
+        return (self._starts.itemsize * len(self._starts)
+                + sum(sys.getsizeof(text) for text in list(self._decoded.values())))
+
+    def close(self):
+        self._stop = True
+        self._thread.join()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._source.close()
+        self._file.close()  # 匿名临时文件关闭时即被删除
+
+class FrameClock(QObject):
+    """按目标帧率触发的帧时钟，每帧携带单调时钟时间戳
+
+    自适应节能：没有内容或画面不可见时停止（idle），每帧位移不足1像素时降低帧率（throttled），
+    其余情况按目标帧率运行（active）。内容或可见性变化时立即恢复。
+    """
+    frame = pyqtSignal(float)  # 参数为 time.monotonic() 时间戳（秒）
+    mode_changed = pyqtSignal(str, str)  # (新模式, 原模式)
+    wake_requested = pyqtSignal()  # 可以从任意线程发出，唤醒已停止的时钟
+
+    FRAME_RATES = (30, 60, 120, 0)  # 0 表示跟随显示器刷新率
+    MIN_THROTTLED_FPS = 5  # 降频时的最低帧率，单帧步长不超过 LyricLabel 的0.25秒上限
+
+    def __init__(self, fps=30, parent=None):
+        super(FrameClock, self).__init__(parent)
+        self.fps = fps
+        self.mode = 'active'
+        self.throttled_fps = None
+        self.timer = QTimer(self)
+        # 使用精确定时器，减少帧间隔抖动
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.on_timeout)
+        self.wake_requested.connect(self.wake)
+        self.set_fps(fps)
+
+    def effective_fps(self):
+        """实际使用的帧率，跟随显示器时读取主屏幕刷新率"""
+        if self.fps:
+            return self.fps
+        screen = QApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen else 0
+        return refresh_rate if refresh_rate > 0 else 60
+
+    def current_fps(self):
+        """当前模式下的帧率，停止时为0"""
+        if self.mode == 'idle':
+            return 0
+        return self.throttled_fps or self.effective_fps()
+
+    def interval(self):
+        """当前模式下的目标帧间隔（秒）"""
+        return 1 / (self.throttled_fps or self.effective_fps())
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.apply_mode()
+
+    def set_activity(self, has_content, visible, max_speed):
+        """根据是否有内容、画面是否可见和最快的滚动速度（像素/秒）选择模式"""
+        previous = self.mode
+        if not has_content or not visible:
+            mode, throttled_fps = 'idle', None
+        elif max_speed < self.effective_fps():
+            # 每帧位移不足1像素，按约每像素一帧降低帧率
+            mode, throttled_fps = 'throttled', max(self.MIN_THROTTLED_FPS, math.ceil(max_speed))
+        else:
+            mode, throttled_fps = 'active', None
+        if mode == previous and throttled_fps == self.throttled_fps:
+            return
+        self.mode = mode
+        self.throttled_fps = throttled_fps
+        self.apply_mode()
+        if mode != previous:
+            log.info(f"帧时钟模式: {previous} -> {mode}（{self.current_fps()} FPS）",
+                     extra={'fields': {'mode': mode, 'previous': previous, 'fps': self.current_fps()}})
+            self.mode_changed.emit(mode, previous)
+
+    def apply_mode(self):
+        if self.mode == 'idle':
+            self.timer.stop()
+        else:
+            self.timer.start(max(1, round(1000 / self.current_fps())))
+
+    def wake(self):
+        """立即恢复按目标帧率运行，下一帧再重新判断模式"""
+        if self.mode != 'active':
+            previous = self.mode
+            self.mode = 'active'
+            self.throttled_fps = None
+            self.apply_mode()
+            log.debug(f"帧时钟模式: {previous} -> active（唤醒）")
+            self.mode_changed.emit('active', previous)
+
+    def on_timeout(self):
+        self.frame.emit(time.monotonic())
+
+def diff_lines(old_lines, new_lines, old_key=None, new_key=None):
+    """逐行比较两组文本，返回 (差异操作列表, 新增或修改的行数)
+
+    差异操作与 difflib.SequenceMatcher.get_opcodes() 格式相同。先去掉相同的开头和结尾，
+    只对中间部分做逐行比较，少量改动时开销与总行数基本无关。
+    """
+    old_key = old_key or old_lines.__getitem__
+    new_key = new_key or new_lines.__getitem__
+    old_count = len(old_lines)
+    new_count = len(new_lines)
+    prefix = 0
+    while prefix < old_count and prefix < new_count and old_key(prefix) == new_key(prefix):
+        prefix += 1
+    suffix = 0
+    while (suffix < old_count - prefix and suffix < new_count - prefix
+           and old_key(old_count - 1 - suffix) == new_key(new_count - 1 - suffix)):
+        suffix += 1
+    matcher = SequenceMatcher(None,
+                              [old_key(i) for i in range(prefix, old_count - suffix)],
+                              [new_key(j) for j in range(prefix, new_count - suffix)],
+                              autojunk=False)
+    opcodes = [('equal', 0, prefix, 0, prefix)]
+    changed = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+        if tag != 'equal':
+            changed += j2 - j1
+    opcodes.append(('equal', old_count - suffix, old_count, new_count - suffix, new_count))
+    return [op for op in opcodes if op[1] != op[2] or op[3] != op[4]], changed
+
+class RasterSignals(QObject):
+    """后台光栅化任务完成后通知界面线程（信号跨线程时自动排队到界面线程）"""
+    done = pyqtSignal(object)
+
+class RasterResult:
+    def __init__(self, job):
+        self.generation = job.generation
+        self.font = job.font
+        self.color = job.color
+        self.source = job.source
+        self.metrics = None  # 按新字体测量好的 TextMetricsIndex
+        self.timeline = None  # 按新行宽排布好的滚动带（轮播模式下为 None）
+        self.tiles = []  # (文本, 分块序号, QImage)
+        self.error = None
+
+class FontRasterJob(QRunnable):
+    """在线程池中按新字体测量文本行，并把可见行的分块渲染到 QImage，界面线程不被阻塞"""
+    def __init__(self, signals, generation, font, color, source, count, segments, right_edge, ratio, picked=(),
+                 layout_width=None):
+        super(FontRasterJob, self).__init__()
+        self.signals = signals
+        self.generation = generation
+        self.font = font
+        self.color = color
+        self.source = source  # 提交时的文本源，交换时用于确认文本没有被替换
+        self.count = count  # 需要测量的行数
+        self.picked = picked  # 轮播模式下需要单独测量的行号（已排好的广告）
+        self.layout_width = layout_width  # 滚动带上的行间距，为 None 时不排布滚动带
+        self.segments = segments  # 提交时可见的 (行号, x坐标)
+        self.right_edge = right_edge
+        self.ratio = ratio
+
+    def run(self):
+        result = RasterResult(self)
+        try:
+            # 映射文件的行缓存不是线程安全的，直接从映射中解码
+            get_line = self.source._decode if isinstance(self.source, MappedTextFile) else self.source.__getitem__
+            lines = [get_line(index) for index in range(self.count)]
+            metrics = TextMetricsIndex()
+            metrics.reset(self.font)
+            metrics.measure_until(lines, len(lines))
+            for index in self.picked:
+                metrics.measure_index(self.source, index)  # 轮播模式下文本源是列表，可直接读取
+            result.metrics = metrics
+            if self.layout_width is not None:
+                # 已测量的行按新行宽排布好，界面线程直接换用，不需要逐行重新排布
+                timeline = ScrollTimeline(self.layout_width)
+                for index in range(len(lines)):
+                    timeline.append(metrics.widths[index])
+                result.timeline = timeline
+            tile_width = LyricLabel.TILE_WIDTH
+            for index, x in self.segments:
+                line_width = metrics.width(index)
+                if line_width <= 0:
+                    continue
+                text = lines[index] if index < len(lines) else self.source[index]
+                height = max(1, metrics.height(index))
+                # 交换前文字还会继续左移，按提交时的位置多渲染到右侧预取区域之外
+                first = max(0, int(-x // tile_width))
+                last = min((line_width - 1) // tile_width, int((self.right_edge - x) // tile_width))
+                for tile in range(first, last + 1):
+                    tile_x = tile * tile_width
+                    width = max(1, min(tile_width, line_width - tile_x))
+                    image = QImage(math.ceil(width * self.ratio), math.ceil(height * self.ratio),
+                                   QImage.Format_ARGB32_Premultiplied)
+                    image.setDevicePixelRatio(self.ratio)
+                    image.fill(Qt.transparent)
+                    painter = QPainter(image)
+                    LyricLabel.draw_tile(painter, text, self.color, tile_x, height, metrics.layouts)
+                    painter.end()
+                    result.tiles.append((text, tile, image))
+        except Exception as e:
+            result.error = str(e)
+        try:
+            self.signals.done.emit(result)
+        except RuntimeError:
+            pass  # 任务完成前轨道已被销毁，结果不再需要
 
 class LyricLabel(QLabel):
-    def __init__(self, parent=None):
+    TILE_WIDTH = 512  # 每个分块位图的宽度（像素）
+    PREFETCH_WIDTH = 512  # 在视口右侧提前渲染的宽度（像素）
+    SUBPIXEL_SCALE = 1.0000001  # 绘制分块时附加的可忽略的缩放，见 paint_content
+    LAYOUT_CHUNK = 64  # 每批测量并排布的行数
+    SYNC_TIME_CONSTANT = 0.5  # 跟随模式下漂移修正的时间常数（秒），越大越平缓
+    SYNC_SNAP_DISTANCE = 400  # 与目标位置相差超过该距离（像素）时直接跳到目标位置
+    font_applied = pyqtSignal()  # 新字体测量并交换完成，行高可能已变化
+
+    SCHEDULE_AHEAD = 2  # 轮播模式下在当前广告之后提前选好、测量并渲染的条数
+    SLOT_COMPACT_THRESHOLD = 64  # 轮播模式下已播过的位置超过该数量时从滚动带上丢弃
+    WARM_SAVE_DELAY = 5000  # 加载后写入预热缓存的延迟（毫秒）
+
+    def __init__(self, parent=None, frame_clock=None, pixmap_cache=None):
         try:
             super(LyricLabel, self).__init__(parent)
             self.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)  # 左对齐且垂直居中
@@ -18,205 +709,1030 @@ class LyricLabel(QLabel):
             self.setFont(self.current_font)
             self.setStyleSheet(f'color: {self.text_color.name()}')
             
-            self.speed = 2
-            self.timer = QTimer(self)
-            self.timer.timeout.connect(self.scroll_text)
-            self.timer.start(30)
+            self.speed = 60.0  # 滚动速度（像素/秒）
+            # 滚动按真实经过的时间推进，定时器晚到不会让文字变慢
+            self.last_tick_time = None
+            # 多条轨道时由窗口传入共用的帧时钟，所有轨道在同一帧推进并合并为一次重绘
+            self.frame_clock = frame_clock or FrameClock(30, self)
+            self.frame_clock.frame.connect(self.scroll_text)
+            self.frame_clock.mode_changed.connect(self.on_clock_mode_changed)
             
             self.text_lines = []
-            self.current_line = 0
-            self.offset = 0
-            self.last_text_width = 0  # 保存上一行文本的宽度，用于无缝连接
-            self.next_label = None  # 辅助标签，用于无缝连接下一轮
+            self.current_line = 0  # 当前最左侧可见的行
+            # 加载广告目录（.jsonl）时进入轮播模式：滚动带是由调度器逐条选出的播放序列，
+            # 每个位置（slot）对应目录中的一行
+            self.scheduler = None
+            self.slot_lines = array('l')  # 每个位置播放的行号
+            self.current_slot = 0  # 当前最左侧可见的位置
             self.cycle_spacing = 50  # 两轮字幕之间的间距（像素）
+            # 所有行预先排布到一条滚动带上，运行时只移动可见窗口，不创建任何控件
+            self.timeline = ScrollTimeline()
+            self.scroll_pos = 0.0  # 可见窗口左边界在滚动带上的浮点位置，按亚像素插值绘制
+            self.segments = []  # 当前帧可见的 (行号, x坐标)
+            self.line_switches = 0  # 行切换次数
+            self.wraps = 0  # 开始新一轮的次数
+            # 多实例同步的跟随模式：按主实例发布的周期起点和速度计算位置
+            self.sync_state = None
+            self.sync_offset = 0.0  # 本屏幕视口相对主实例视口的水平偏移（像素）
+            self.sync_layout_width = None  # 使用主实例的行间距，保证两边的滚动带一致
+            # 帧时间统计，默认关闭
+            self.stats = None
+            self.stats_overlay = False
+            # 监视已加载的文本文件，内容变化后在后台比较差异，在下一行切换时应用
+            self.file_path = None
+            self.pending_reload = None  # (比较时的文本源, 新的文本源, 差异操作列表, 新内容的键, 控制命令, 准备好的排布)
+            self.reload_thread = None
+            self.queued_line_commands = []  # 控制接口的增删行命令，等后台线程空闲时再准备
+            self.file_watcher = QFileSystemWatcher(self)
+            self.file_watcher.fileChanged.connect(self.on_file_changed)
+            self.reload_timer = QTimer(self)
+            self.reload_timer.setSingleShot(True)
+            self.reload_timer.timeout.connect(self.start_reload)
             self.setWordWrap(False)  # 禁用自动换行
-            # 设置标签宽度足够大，确保文字完全显示
-            self.setMinimumWidth(10000)  # 设置足够大的最小宽度
+            # 每行文本按固定宽度切成分块，按需渲染到位图缓存中，每帧只绘制可见分块
+            # 只有与视口相交或即将进入视口的分块常驻内存，行的长度不再受限
+            # 标签本身铺满父容器，不再移动一个超宽的控件
+            # 多条轨道时共用一个缓存，文本、字体和颜色相同的分块只渲染一次
+            self.pixmap_cache = pixmap_cache if pixmap_cache is not None else PixmapCache()
+            # 修改字体时在线程池中测量和渲染，完成前继续显示旧字体；连续修改只渲染最新一次
+            self.requested_font = None
+            self.font_generation = 0
+            self.raster_busy = False
+            self.raster_signals = RasterSignals(self)
+            self.raster_signals.done.connect(self.apply_raster_result)
+            # 预热缓存（使用配置启动时由窗口设置）：按文件内容和字体保存测量结果和第一行的分块
+            self.warm_cache = None
+            self.warm_source = None  # 快照复制完后读取预热缓存的文本源
+            # 加载或文件改动后等第一行滚动一段时间（已测量并渲染）再写入一次预热缓存，其余时候只在关闭时写入
+            self.warm_save_timer = QTimer(self)
+            self.warm_save_timer.setSingleShot(True)
+            self.warm_save_timer.setInterval(self.WARM_SAVE_DELAY)
+            self.warm_save_timer.timeout.connect(self.save_warm_cache)
+            self.content_key = None  # 当前文本内容的 (哈希, 行数)；通过控制接口修改后为 None，不再写入预热缓存
+            self.warm_saved = None  # 最近一次写入预热缓存的内容，未变化时不重复写入
+            # 提前测量下一批行（带样式标记的行同时按片段排版），由空闲时的零间隔定时器执行
+            self.shape_timer = QTimer(self)
+            self.shape_timer.setSingleShot(True)
+            self.shape_timer.setInterval(0)
+            self.shape_timer.timeout.connect(self.shape_ahead)
+            # 每行文本的宽高只在字体或文本变化时测量一次
+            self.metrics_index = TextMetricsIndex()
+            self.metrics_index.rebuild(self.text_lines, self.current_font)
             # 使用字体度量获取实际高度，确保文字完全显示
             self.update_height()
         except Exception as e:
-            print(f"LyricLabel初始化错误: {str(e)}")
+            log.error(f"LyricLabel初始化错误: {str(e)}")
             raise
 
-    def scroll_text(self):
+    def scroll_text(self, now=None):
         try:
-            if not self.text_lines:
+            if now is None:
+                now = time.monotonic()
+            if self.stats is None:
+                self.advance(now)
                 return
-            
-            parent_width = self.parent().width()
-            
-            # 更新主标签位置
-            self.offset -= self.speed
-            text_width = self.fontMetrics().width(self.text())
-            self.update_position()
-            
-            # 计算文本的右边界位置（最后一个字的位置）
-            text_right_edge = self.offset + text_width
-            
-            # 判断是否是最后一行
-            is_last_line = (self.current_line == len(self.text_lines) - 1)
-            
-            # 当最后一行的右边界（最后一个字）滚动过屏幕最右侧时，创建辅助标签显示第一行
-            if is_last_line and text_right_edge < parent_width and self.next_label is None:
-                # 保存当前行（最后一行）的文本宽度和结束位置
-                current_text_width = text_width
-                current_end_position = self.offset + current_text_width
-                
-                # 创建辅助标签显示第一行，实现无缝连接
-                self.next_label = QLabel(self.parent())
-                self.next_label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                self.next_label.setFont(self.current_font)
-                self.next_label.setStyleSheet(f'color: {self.text_color.name()}')
-                self.next_label.setText(self.text_lines[0])
-                self.next_label.setWordWrap(False)
-                self.next_label.setMinimumWidth(10000)
-                self.next_label.setMinimumHeight(self.height())
-                self.next_label.resize(self.width(), self.height())
-                
-                # 辅助标签从最后一行结束的位置开始，添加间距以区分每一轮字幕
-                next_label_offset = current_end_position + self.cycle_spacing
-                parent_height = self.parent().height()
-                label_height = self.next_label.height()
-                y_pos = max(0, (parent_height - label_height) // 2)
-                self.next_label.move(next_label_offset, y_pos)
-                self.next_label.show()
-                
-                print(f"创建辅助标签，第1行紧接在第{len(self.text_lines)}行后面，间距={self.cycle_spacing}px, offset={next_label_offset:.2f}")
-            
-            # 更新辅助标签位置（如果存在）
-            if self.next_label:
-                next_label_offset = self.next_label.x() - self.speed
-                self.next_label.move(next_label_offset, self.next_label.y())
-                
-                # 当主标签完全离开左侧时，将辅助标签设为主标签
-                if self.offset <= -text_width:
-                    # 切换到第一行
-                    self.current_line = 0
-                    self.setText(self.text_lines[0])
-                    # 主标签从辅助标签的位置开始（已经包含了间距）
-                    self.offset = next_label_offset
-                    # 删除辅助标签
-                    self.next_label.deleteLater()
-                    self.next_label = None
-                    print(f"辅助标签转换为主标签，开始新一轮循环，offset={self.offset:.2f}")
-            
-            # 当文本完全滚动出视图左侧时，切换到下一行（中间切换，且没有辅助标签）
-            elif self.offset <= -text_width and self.next_label is None:
-                next_line_index = (self.current_line + 1) % len(self.text_lines)
-                
-                # 切换到下一行
-                self.current_line = next_line_index
-                self.setText(self.text_lines[self.current_line])
-                
-                # 中间切换：下一行从窗口右侧开始
-                self.offset = parent_width
-                print(f"切换到第 {self.current_line + 1} 行: {self.text_lines[self.current_line]}, offset={self.offset}")
-                
-        except Exception as e:
-            print(f"滚动文本错误: {str(e)}")
+            started = time.perf_counter()
+            self.advance(now)
+            self.stats.record_tick(now, self.frame_clock.interval(), time.perf_counter() - started)
+            self.stats.maybe_dump(now, self.pixmap_cache)
+        except Exception as e:
+            log.error(f"滚动文本错误: {str(e)}")
+
+    def enable_stats(self, dump_path=None, dump_interval=5.0, overlay=False):
+        """启用帧时间统计，可选定期写入JSON文件和在画面左上角显示调试信息"""
+        self.stats = FrameStats(dump_path, dump_interval)
+        self.stats.clock_mode = self.frame_clock.mode
+        self.stats_overlay = overlay
+
+    def on_clock_mode_changed(self, mode, previous):
+        """时钟从停止中恢复时，停止期间不计入滚动位移和帧间隔"""
+        try:
+            if previous == 'idle':
+                self.last_tick_time = None
+            if self.stats:
+                if previous == 'idle':
+                    self.stats.last_tick = None
+                self.stats.clock_mode = mode
+                # 停止后不再有帧，立即写入一次，统计文件能反映当前模式
+                self.stats.maybe_dump(time.monotonic(), self.pixmap_cache, force=True)
+        except Exception as e:
+            log.error(f"切换时钟模式错误: {str(e)}")
+
+    def has_content(self):
+        """是否有需要滚动的内容（包括正在建立索引的文件和待应用的改动）"""
+        return (bool(self.text_lines) or not getattr(self.text_lines, 'done', True)
+                or self.pending_reload is not None or bool(self.queued_line_commands))
+
+    def advance(self, now):
+        """把滚动推进到时间now"""
+        # 按与上一帧的时间差计算位移；长时间停顿（如系统休眠）后限制单帧步长
+        elapsed = 0.0 if self.last_tick_time is None else min(now - self.last_tick_time, 0.25)
+        self.last_tick_time = now
+        if self.warm_source is not None and self.warm_source.copied:
+            source, self.warm_source = self.warm_source, None
+            if source is self.text_lines:
+                self.load_warm_cache(source.content_key)
+        if not self.text_lines:
+            # 没有正在滚动的内容时，文件改动直接应用
+            if self.pending_reload:
+                self.apply_pending_reload()
+            self.start_line_commands()
+            return
+        
+        self.scroll_pos += self.speed * elapsed
+        if self.sync_state:
+            self.correct_sync(elapsed)
+        # 滚动到哪里就测量、排布到哪里，大文件不需要先测量全部行
+        self.ensure_layout(self.scroll_pos + self.viewport_width() + self.PREFETCH_WIDTH)
+        # 越过一整轮后折回，第一行已紧接在最后一行之后（间距为cycle_spacing）
+        if self.timeline.cycle_length > 0 and self.scroll_pos >= self.timeline.cycle_length:
+            self.scroll_pos = self.timeline.normalize(self.scroll_pos)
+            self.wraps += 1
+            if self.stats:
+                self.stats.wraps += 1
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"第1行紧接在第{len(self.text_lines)}行后面，间距={self.cycle_spacing}px，开始新一轮循环",
+                          extra={'fields': {'wraps': self.wraps}})
+        previous_line = self.current_line
+        previous_slot = self.current_slot
+        self.update_segments()
+        # 文件改动只在行切换时应用，此时新行刚从右侧进入，正在滚动的内容不受影响
+        if self.pending_reload and (self.current_line != previous_line or self.current_slot != previous_slot):
+            self.apply_pending_reload()
+        if self.queued_line_commands:
+            self.start_line_commands()
+        if self.scheduler is not None and self.current_slot >= self.SLOT_COMPACT_THRESHOLD:
+            self.compact_slots()
+        self.prefetch_tiles()
+        # 下一批要排布的行还没测量时，在帧与帧之间的空闲时间测量和排版，帧内不需要排版
+        if not self.shape_timer.isActive() and self.needs_shaping():
+            self.shape_timer.start()
+        self.update()
+
+    def viewport_width(self):
+        return self.parent().width() if self.parent() else self.width()
+
+    def layout_width(self):
+        """滚动带上行与行之间的间距：通常为视口宽度，跟随模式下使用主实例的视口宽度"""
+        return self.sync_layout_width or self.viewport_width()
+
+    def apply_sync_state(self, state, offset=0.0):
+        """跟随主实例发布的轨道状态；排布参数变化时重新排布滚动带"""
+        self.sync_offset = offset
+        self.speed = float(state['speed'])
+        layout_changed = (state['layout_width'] != self.sync_layout_width
+                          or state['cycle_spacing'] != self.cycle_spacing)
+        self.sync_state = state
+        if layout_changed:
+            self.sync_layout_width = state['layout_width']
+            self.cycle_spacing = state['cycle_spacing']
+            self.rebuild_timeline(self.current_line + 1)
+
+    def correct_sync(self, elapsed):
+        """把滚动位置平滑地拉向共享时钟给出的目标位置，不会一帧跳一大段"""
+        target = scroll_sync.target_position(self.sync_state, offset=self.sync_offset)
+        self.ensure_layout(target + self.viewport_width() + self.PREFETCH_WIDTH)
+        target = self.timeline.normalize(target)
+        error = target - self.scroll_pos
+        cycle_length = self.timeline.cycle_length
+        if cycle_length > 0:
+            # 目标刚折回新一轮而自身还没折回时（或相反），按最短距离修正
+            error = (error + cycle_length / 2) % cycle_length - cycle_length / 2
+        if abs(error) > self.SYNC_SNAP_DISTANCE:
+            self.scroll_pos = target
+        else:
+            self.scroll_pos += error * min(1.0, elapsed / self.SYNC_TIME_CONSTANT)
+
+    def update_segments(self):
+        """根据当前滚动位置计算可见（含右侧预取区域）的行段"""
+        segments = self.timeline.visible_segments(self.scroll_pos, self.viewport_width() + self.PREFETCH_WIDTH)
+        if self.scheduler is not None and segments:
+            # 轮播模式下把位置换算为目录中的行号
+            slot = segments[0][0]
+            if slot != self.current_slot:
+                self.current_slot = slot
+                self.current_line = -1  # 同一条广告连续播放时也输出切换信息
+            segments = [(self.slot_lines[slot], x) for slot, x in segments]
+        self.segments = segments
+        if self.segments and self.segments[0][0] != self.current_line:
+            self.current_line = self.segments[0][0]
+            # 滚动路径上默认只计数，调试级别才格式化和输出
+            self.line_switches += 1
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"切换到第 {self.current_line + 1} 行: {self.text_lines[self.current_line]}",
+                          extra={'fields': {'line': self.current_line + 1, 'switches': self.line_switches}})
+
+    def ensure_layout(self, right_edge, min_lines=0):
+        """按需测量文本行并追加到滚动带，直到覆盖right_edge（滚动带坐标）且至少排布min_lines行"""
+        if self.scheduler is not None:
+            self.schedule_slots(right_edge, min_lines)
+            return
+        if self.timeline.complete:
+            return
+        # 先读取是否加载完毕再读取行数，避免把尚未索引的行当成最后一行
+        done = getattr(self.text_lines, 'done', True)
+        available = len(self.text_lines)
+        while len(self.timeline) < available and (self.timeline.next_start < right_edge
+                                                  or len(self.timeline) < min_lines):
+            end = min(available, max(len(self.timeline) + self.LAYOUT_CHUNK, min_lines))
+            self.metrics_index.measure_until(self.text_lines, end)
+            for index in range(len(self.timeline), end):
+                self.timeline.append(self.metrics_index.widths[index])
+        if done and len(self.timeline) == available:
+            self.timeline.finish(self.cycle_spacing)
+
+    def needs_shaping(self):
+        """是否有需要在空闲时间提前测量或排版的行"""
+        if self.scheduler is not None:
+            # 轮播模式：下一帧就要选下一条广告时，提前一条选好
+            return len(self.timeline) <= self.current_slot + self.SCHEDULE_AHEAD + 1
+        return (not self.timeline.complete
+                and len(self.metrics_index) < min(len(self.text_lines), len(self.timeline) + self.LAYOUT_CHUNK))
+
+    def shape_ahead(self):
+        """测量（并排版）滚动带接下来要排布的一批行，滚动到时直接追加，不在帧内测量"""
+        try:
+            if self.scheduler is None:
+                self.metrics_index.measure_until(
+                    self.text_lines, min(len(self.text_lines), len(self.timeline) + self.LAYOUT_CHUNK))
+                return
+            # 轮播模式：多选一条广告并测量；已排好的广告的片段排版被淘汰时重新排版，帧内渲染分块时不需要排版
+            self.schedule_slots(0, self.current_slot + self.SCHEDULE_AHEAD + 2)
+            for index in self.slot_lines[self.current_slot:]:
+                self.metrics_index.shape(self.text_lines[index])
+        except Exception as e:
+            log.error(f"提前排版错误: {str(e)}")
+
+    def schedule_slots(self, right_edge, min_slots=0):
+        """轮播模式：由调度器逐条选出广告追加到滚动带，直到覆盖right_edge，并在当前位置之后多选好几条
+
+        广告在被选中时才测量，目录再大也不需要在载入时全部测量。
+        """
+        while (self.timeline.next_start < right_edge or len(self.timeline) < min_slots
+               or len(self.timeline) <= self.current_slot + self.SCHEDULE_AHEAD):
+            index = self.scheduler.next()
+            if index is None:
+                break  # 暂时没有可播放的广告，下一帧再试
+            # 一段时间没有可播放的广告后，新选出的广告仍从视口右侧进入，而不是出现在已经滚过的位置
+            self.timeline.next_start = max(self.timeline.next_start, self.scroll_pos + self.viewport_width())
+            self.slot_lines.append(index)
+            self.timeline.append(self.metrics_index.measure_index(self.text_lines, index))
+
+    def compact_slots(self):
+        """丢弃已经播完的位置，滚动带和位置列表不会随播放时间无限增长"""
+        shift = self.timeline.drop_front(self.current_slot)
+        del self.slot_lines[:self.current_slot]
+        self.scroll_pos -= shift
+        self.current_slot = 0
+
+    def layout_index(self):
+        """当前行在滚动带上的序号：轮播模式下为位置，否则为行号"""
+        return self.current_slot if self.scheduler is not None else self.current_line
+
+    def rebuild_timeline(self, min_lines=0):
+        """行宽、视口宽度或轮次间距变化后重新排布滚动带，其余行在滚动到时再排布"""
+        self.timeline.reset(self.layout_width())
+        if self.scheduler is not None:
+            # 已经选好的播放序列保持不变，只按新的行宽重新排布
+            for index in self.slot_lines:
+                self.timeline.append(self.metrics_index.measure_index(self.text_lines, index))
+        self.ensure_layout(0, min_lines)
+
+    def restart_line(self, index):
+        """让指定行从父容器（窗口）的右侧重新开始滚动；轮播模式下重新开始的是当前位置"""
+        if self.scheduler is not None:
+            self.ensure_layout(0, self.current_slot + 1)
+            if self.current_slot < len(self.timeline):
+                self.scroll_pos = self.timeline.enter_position(self.current_slot)
+            else:
+                self.scroll_pos = self.timeline.origin()
+            self.update_segments()
+            self.update()
+            return
+        self.ensure_layout(0, index + 1)
+        if 0 <= index < len(self.timeline.starts):
+            self.current_line = index
+            self.scroll_pos = self.timeline.enter_position(index)
+        else:
+            self.current_line = 0
+            self.scroll_pos = self.timeline.origin()
+        self.update_segments()
+        self.update()
+
+    def seek(self, seconds):
+        """直接跳到第一行开始进入后经过seconds秒的位置，不需要逐帧推进"""
+        position = self.timeline.origin() + self.speed * seconds
+        # 只需排布到该位置；整轮排布完后直接折回到一轮之内
+        self.ensure_layout(position + self.viewport_width() + self.PREFETCH_WIDTH)
+        self.scroll_pos = self.timeline.normalize(position)
+        self.last_tick_time = None
+        self.update_segments()
+        self.prefetch_tiles()
+        self.update()
 
     def update_height(self):
         """根据当前字体更新标签高度，确保文字完全显示"""
         try:
-            # 使用fontMetrics获取字体的实际渲染高度
-            # height() 返回字体的实际高度（包括上升和下降部分）
-            font_height = self.fontMetrics().height()
+            # 使用度量索引中缓存的行高（包括上升和下降部分）
+            font_height = self.metrics_index.line_height
             # 添加额外的边距以确保文字不被截断（上下各5像素）
             padding = 10
             new_height = font_height + padding
             self.setMinimumHeight(new_height)
-            # 确保标签宽度足够大，以便显示完整文字
-            # 保持当前宽度，只更新高度
-            current_width = max(self.width(), 10000) if self.width() > 0 else 10000
-            self.resize(current_width, new_height)
+            # 保持当前宽度，只更新高度；update_position会再按父容器调整
+            self.resize(self.width(), new_height)
             # 更新垂直位置以确保居中
             self.update_position()
         except Exception as e:
-            print(f"更新高度错误: {str(e)}")
+            log.error(f"更新高度错误: {str(e)}")
     
     def update_position(self):
-        """更新标签的垂直位置，确保在容器中居中"""
+        """让标签铺满父容器，并按当前滚动位置重绘"""
         try:
             if self.parent():
-                parent_height = self.parent().height()
-                label_height = self.height()
-                y_pos = max(0, (parent_height - label_height) // 2)  # 垂直居中
-                # 只更新y坐标，保持x坐标不变
-                self.move(self.offset, y_pos)
+                parent_rect = self.parent().rect()
+                # 只有容器尺寸变化时才调整几何，避免每帧触发布局
+                if self.geometry() != parent_rect:
+                    width_changed = self.width() != parent_rect.width()
+                    self.setGeometry(parent_rect)
+                    if width_changed and self.segments:
+                        # 视口宽度决定行间距，重新排布后保持当前行的屏幕位置不变
+                        current_x = self.segments[0][1]
+                        self.rebuild_timeline(self.layout_index() + 1)
+                        self.scroll_pos = self.timeline.starts[self.layout_index()] - current_x
+                        self.update_segments()
+            self.update()
         except Exception as e:
-            print(f"更新位置错误: {str(e)}")
+            log.error(f"更新位置错误: {str(e)}")
+
+    def tile_key(self, index, tile):
+        return (self.text_lines[index], self.current_font.key(), self.text_color.rgba(), tile)
+
+    def tile_pixmap(self, index, tile):
+        """获取某一行第tile个分块的位图，不存在时渲染一次并放入缓存"""
+        key = self.tile_key(index, tile)
+        pixmap = self.pixmap_cache.get(key)
+        if pixmap is None:
+            ratio = self.devicePixelRatioF()
+            line_width = self.metrics_index.width(index)
+            tile_x = tile * self.TILE_WIDTH
+            width = max(1, min(self.TILE_WIDTH, line_width - tile_x))
+            height = max(1, self.metrics_index.height(index))
+            pixmap = QPixmap(math.ceil(width * ratio), math.ceil(height * ratio))
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            self.draw_tile(painter, self.text_lines[index], self.text_color, tile_x, height,
+                           self.metrics_index.layouts)
+            painter.end()
+            self.pixmap_cache.put(key, pixmap)
+        return pixmap
+
+    @staticmethod
+    def draw_tile(painter, text, color, tile_x, height, layouts):
+        """把一行文本中从tile_x开始的分块画到painter上（界面线程和后台线程共用）"""
+        # 各片段对齐到同一基线，只绘制与分块相交的片段，使用缓存的排版结果；
+        # 不带样式的行整行是一个片段，只排版一次，各分块平移后绘制同一个 QStaticText
+        baseline = (height - layouts.line_height) / 2 + layouts.ascent
+        x = -tile_x
+        for run in styled_text.line_runs(text):
+            layout = layouts.get(run)
+            if x < LyricLabel.TILE_WIDTH and x + layout.width > 0:
+                run_color = QColor(run.color) if run.color else color
+                painter.setFont(layout.font)
+                painter.setPen(run_color if run_color.isValid() else color)
+                painter.drawStaticText(QPointF(x, baseline - layout.ascent), layout.static_text)
+            x += layout.width
+
+    def iter_tiles(self, right_edge):
+        """遍历落在 [0, right_edge) 内的分块，产生 (行号, 分块序号, 分块x坐标)"""
+        for index, x in self.segments:
+            line_width = self.metrics_index.width(index)
+            if line_width <= 0:
+                continue  # 空行不需要绘制
+            first = max(0, int(-x // self.TILE_WIDTH))
+            last = min((line_width - 1) // self.TILE_WIDTH, int((right_edge - x) // self.TILE_WIDTH))
+            for tile in range(first, last + 1):
+                tile_x = x + tile * self.TILE_WIDTH
+                if tile_x >= right_edge:
+                    break
+                yield index, tile, tile_x
+
+    def prefetch_tiles(self):
+        """提前渲染即将进入视口的分块，并释放已经滚出视口的分块"""
+        keep = set()
+        for index, tile, _ in self.iter_tiles(self.viewport_width() + self.PREFETCH_WIDTH):
+            keep.add(self.tile_key(index, tile))
+            self.tile_pixmap(index, tile)
+        if self.scheduler is not None and self.segments:
+            # 轮播模式下提前渲染后面已选好的广告的第一个分块，衔接时不需要等待渲染
+            next_slot = self.current_slot + len(self.segments)
+            for slot in range(next_slot, min(len(self.slot_lines), next_slot + self.SCHEDULE_AHEAD)):
+                index = self.slot_lines[slot]
+                if self.metrics_index.width(index) > 0:
+                    keep.add(self.tile_key(index, 0))
+                    self.tile_pixmap(index, 0)
+        self.pixmap_cache.retain(keep, self)
+
+    def paintEvent(self, event):
+        try:
+            if self.stats is None:
+                if not self.text_lines or not self.segments:
+                    return
+                painter = QPainter(self)
+                self.paint_content(painter)
+                painter.end()
+                return
+            started = time.perf_counter()
+            painter = QPainter(self)
+            self.paint_content(painter)
+            self.stats.record_paint(time.perf_counter() - started)
+            if self.stats_overlay:
+                self.paint_stats_overlay(painter)
+            painter.end()
+        except Exception as e:
+            log.error(f"绘制文本错误: {str(e)}")
+
+    def paint_stats_overlay(self, painter):
+        """在左上角绘制调试信息"""
+        text = self.stats.overlay(time.monotonic(), self.pixmap_cache)
+        painter.setFont(QFont(self.font().family(), 9))
+        rect = painter.fontMetrics().boundingRect(text).adjusted(-4, -2, 4, 2)
+        rect.moveTo(0, 0)
+        painter.fillRect(rect, QColor(0, 0, 0, 180))
+        painter.setPen(QColor(Qt.green))
+        painter.drawText(rect, Qt.AlignCenter, text)
+
+    def paint_content(self, painter):
+        """只绘制与标签可见范围相交的分块；无窗口渲染时直接画到图像上"""
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        for index, tile, tile_x in self.iter_tiles(self.width()):
+            pixmap = self.tile_pixmap(index, tile)
+            ratio = pixmap.devicePixelRatioF()
+            tile_height = pixmap.height() / ratio
+            y_pos = max(0, (self.height() - tile_height) // 2)  # 垂直居中
+            device_x = tile_x * ratio
+            if abs(device_x - round(device_x)) < 1 / 64:
+                painter.drawPixmap(QPointF(round(device_x) / ratio, y_pos), pixmap)
+                continue
+            # 光栅引擎对只有平移的绘制按整像素对齐、不插值；附加一个可以忽略的缩放，
+            # 分块才会按双线性插值落在亚像素位置，低速滚动也不会一顿一顿
+            painter.save()
+            painter.translate(tile_x, y_pos)
+            painter.scale(self.SUBPIXEL_SCALE, 1.0)
+            painter.drawPixmap(QPointF(0, 0), pixmap)
+            painter.restore()
     
     def set_speed(self, speed):
         try:
-            self.speed = speed
+            self.speed = float(speed)  # 像素/秒
         except Exception as e:
-            print(f"设置速度错误: {str(e)}")
+            log.error(f"设置速度错误: {str(e)}")
 
     def set_text_color(self, color):
         try:
             self.text_color = color
             self.setStyleSheet(f'color: {self.text_color.name()}')
-            # 如果存在辅助标签，删除它以避免重影，让滚动逻辑重新创建
-            if self.next_label:
-                self.next_label.deleteLater()
-                self.next_label = None
+            # 缓存可能与其他轨道共用，不整体清空；旧颜色的分块在下一帧预取时释放
+            self.prefetch_tiles()
+            self.update()
         except Exception as e:
-            print(f"设置颜色错误: {str(e)}")
+            log.error(f"设置颜色错误: {str(e)}")
 
     def set_font(self, font):
+        """请求更换字体：有文本时在后台测量和渲染，完成后一次性交换，期间继续显示旧字体"""
         try:
-            self.current_font = font
+            self.requested_font = QFont(font)
             self.font_size = font.pointSize()
-            self.setFont(self.current_font)
-            # 使用字体度量更新高度，确保文字完全显示
-            self.update_height()
-            # 如果存在辅助标签，删除它以避免重影，让滚动逻辑重新创建
-            if self.next_label:
-                self.next_label.deleteLater()
-                self.next_label = None
-            if self.parent():
-                self.offset = self.parent().width()  # 从父容器（窗口）的右侧开始滚动
-                self.update_position()  # 更新位置
+            self.font_generation += 1
+            if not self.text_lines:
+                # 没有文本时没有需要测量的内容，直接应用
+                self.apply_font_now(self.requested_font)
+            elif not self.raster_busy:
+                self.start_raster_job()
         except Exception as e:
-            print(f"设置字体错误: {str(e)}")
+            log.error(f"设置字体错误: {str(e)}")
 
     def set_font_size(self, size):
         try:
-            self.font_size = size
-            self.current_font.setPointSize(size)
+            font = QFont(self.requested_font or self.current_font)
+            font.setPointSize(size)
+            self.set_font(font)
+        except Exception as e:
+            log.error(f"设置字体大小错误: {str(e)}")
+
+    def apply_font_now(self, font):
+        """在界面线程中直接应用字体（没有文本或后台任务失败时）"""
+        self.current_font = font
+        self.requested_font = None
+        self.setFont(self.current_font)
+        self.metrics_index.reset(self.current_font)
+        # 使用字体度量更新高度，确保文字完全显示
+        self.update_height()
+        # 行宽变化后重新排布滚动带，当前行从父容器（窗口）的右侧开始滚动
+        self.rebuild_timeline()
+        self.restart_line(self.current_line)
+        self.font_applied.emit()
+
+    def start_raster_job(self):
+        """为最新请求的字体提交后台任务；同一时间只有一个任务，期间的请求只保留最新一次"""
+        count = min(max(len(self.metrics_index), self.current_line + 1), len(self.text_lines))
+        picked = ()
+        layout_width = self.layout_width()
+        if self.scheduler is not None:
+            # 轮播模式下只测量已排好的广告，其余广告被选中时再测量；排好的广告不多，交换时再排布滚动带
+            count = 0
+            picked = sorted(set(self.slot_lines))
+            layout_width = None
+        job = FontRasterJob(self.raster_signals, self.font_generation, QFont(self.requested_font),
+                            QColor(self.text_color), self.text_lines, count, list(self.segments),
+                            self.viewport_width() + 2 * self.PREFETCH_WIDTH, self.devicePixelRatioF(), picked,
+                            layout_width)
+        self.raster_busy = True
+        QThreadPool.globalInstance().start(job)
+
+    def apply_raster_result(self, result):
+        """后台任务完成：仍是最新请求时交换字体、测量结果和分块，否则为最新请求重新提交"""
+        try:
+            self.raster_busy = False
+            if self.requested_font is None:
+                return  # 期间已直接应用了字体
+            if result.generation != self.font_generation or result.source is not self.text_lines:
+                # 有更新的请求，或文本已被替换，这次的结果作废
+                self.start_raster_job()
+                return
+            if result.error:
+                log.warning(f"后台渲染字体错误: {result.error}，改为直接应用")
+                self.apply_font_now(self.requested_font)
+                return
+            current_x = self.segments[0][1] if self.segments else None
+            self.current_font = result.font
+            self.requested_font = None
             self.setFont(self.current_font)
-            # 使用字体度量更新高度，确保文字完全显示
+            self.metrics_index = result.metrics
+            for text, tile, image in result.tiles:
+                key = (text, result.font.key(), result.color.rgba(), tile)
+                self.pixmap_cache.put(key, QPixmap.fromImage(image))
             self.update_height()
-            # 如果存在辅助标签，删除它以避免重影，让滚动逻辑重新创建
-            if self.next_label:
-                self.next_label.deleteLater()
-                self.next_label = None
-            if self.parent():
-                self.offset = self.parent().width()  # 从父容器（窗口）的右侧开始滚动
-                self.update_position()  # 更新位置
+            # 行宽变化后换用后台排布好的滚动带（行间距期间变化时重新排布），当前行保持原来的屏幕位置
+            if result.timeline is not None and result.timeline.viewport_width == float(self.layout_width()):
+                self.timeline = result.timeline
+                self.ensure_layout(0, self.layout_index() + 1)
+            else:
+                self.rebuild_timeline(self.layout_index() + 1)
+            if current_x is None or self.layout_index() >= len(self.timeline):
+                self.restart_line(self.current_line)
+            else:
+                self.scroll_pos = self.timeline.starts[self.layout_index()] - current_x
+                self.update_segments()
+                self.prefetch_tiles()
+                self.update()
+            self.font_applied.emit()
         except Exception as e:
-            print(f"设置字体大小错误: {str(e)}")
+            log.error(f"应用字体错误: {str(e)}")
 
     def load_text_from_file(self, file_path):
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                # 读取所有行，包括空行
-                self.text_lines = [line.strip() for line in file.readlines()]
-                if self.text_lines:
-                    self.current_line = 0
-                    self.setText(self.text_lines[0])
-                    if self.parent():
-                        self.offset = self.parent().width()  # 从父容器（窗口）的右侧开始滚动
-                        self.update_position()  # 更新位置
-                    print(f"加载了 {len(self.text_lines)} 行文本")
-                    # 打印每行文本内容，用于调试
-                    for i, line in enumerate(self.text_lines):
-                        print(f"第 {i+1} 行: {line}")
-                else:
-                    print("文件为空")
-        except Exception as e:
-            print(f"加载文本文件错误: {str(e)}")
+            if hasattr(self.text_lines, 'close'):
+                self.text_lines.close()
+            if file_path.lower().endswith('.jsonl'):
+                self.load_catalog(file_path)
+                return
+            self.scheduler = None
+            # 内存映射文件，后台建立行索引，行内容滚动到时才解码
+            self.text_lines = MappedTextFile(file_path)
+            self.metrics_index.reset(self.current_font)
+            # 快照复制完才知道内容键，之后的第一帧再读取预热缓存
+            self.content_key = None
+            self.warm_source = self.text_lines
+            self.update_position()
+            self.rebuild_timeline()
+            # 第一行从父容器（窗口）的右侧开始滚动，不等待索引建完
+            self.restart_line(0)
+            self.watch_file(file_path)
+            log.info(f"开始加载文本文件: {file_path}")
+        except Exception as e:
+            log.error(f"加载文本文件错误: {str(e)}")
             self.text_lines = []
+            self.scheduler = None
+            self.metrics_index.reset(self.current_font)
+            self.rebuild_timeline()
+            self.segments = []
+
+    def load_catalog(self, file_path):
+        """加载广告目录，进入轮播模式；广告被选中时才测量"""
+        entries = rotation.read_catalog(file_path)
+        self.text_lines = [entry['text'] for entry in entries]
+        self.scheduler = rotation.RotationScheduler(entries)
+        self.slot_lines = array('l')
+        self.current_slot = 0
+        self.metrics_index.reset(self.current_font)
+        key = startup_profile.content_key(file_path) if self.warm_cache else None
+        # 广告目录按条目计数（注释和空行不算）
+        self.load_warm_cache((key[0], len(entries)) if key else None)
+        self.update_position()
+        self.rebuild_timeline()
+        self.restart_line(0)
+        self.watch_file(file_path)
+        log.info(f"加载了广告目录: {file_path}，共 {len(entries)} 条")
+
+    def load_warm_cache(self, content_key):
+        """按当前内容的 (哈希, 行数) 从预热缓存恢复当前字体下的测量结果和第一行的分块，内容或字体不同时不会命中"""
+        self.content_key = content_key
+        if self.warm_cache is None or content_key is None:
+            return
+        self.warm_save_timer.start()
+        try:
+            entry = self.warm_cache.entry(self.content_key[0], self.current_font.key())
+            cached = self.warm_cache.load_metrics(entry)
+            # 行高不同说明系统字体已变化，测量结果不再可用
+            cached = (cached is not None and cached[0] == self.metrics_index.line_height
+                      and self.metrics_index.install(cached[2], cached[3], cached[1], self.content_key[1]))
+            color = self.text_color.rgba()
+            ratio = self.devicePixelRatioF()
+            tiles = 0
+            for tile in self.warm_cache.load_tiles(entry):
+                if tile['color'] != color or tile['ratio'] != ratio:
+                    continue
+                pixmap = QPixmap(tile['file'])
+                if pixmap.isNull():
+                    continue
+                pixmap.setDevicePixelRatio(ratio)
+                self.pixmap_cache.put((tile['text'], self.current_font.key(), color, tile['tile']), pixmap)
+                tiles += 1
+            self.warm_saved = (entry, len(self.metrics_index), color, ratio) if cached else None
+            log.info(f"预热缓存: 恢复了 {len(self.metrics_index)} 行的测量结果和 {tiles} 个分块")
+        except Exception as e:
+            log.error(f"读取预热缓存错误: {str(e)}")
+
+    def save_warm_cache(self):
+        """把当前字体下的测量结果和第一行最先进入视口的分块写入预热缓存；与上次写入相同时跳过"""
+        if self.warm_cache is None or self.content_key is None or not self.text_lines:
+            return
+        if self.requested_font is not None:
+            return  # 新字体还在后台渲染
+        try:
+            entry = self.warm_cache.entry(self.content_key[0], self.current_font.key())
+            color = self.text_color.rgba()
+            ratio = self.devicePixelRatioF()
+            state = (entry, len(self.metrics_index), color, ratio)
+            if state == self.warm_saved:
+                return
+            self.warm_cache.save_metrics(entry, self.metrics_index.line_height, self.content_key[1],
+                                         self.metrics_index.widths, self.metrics_index.heights)
+            # 启动时第一行从右侧进入，保存覆盖视口和预取区域的分块
+            tiles = []
+            line_width = self.metrics_index.width(0)
+            if line_width > 0:
+                last = min((line_width - 1) // self.TILE_WIDTH,
+                           (self.viewport_width() + self.PREFETCH_WIDTH) // self.TILE_WIDTH)
+                for tile in range(last + 1):
+                    buffer = QBuffer()
+                    buffer.open(QBuffer.WriteOnly)
+                    self.tile_pixmap(0, tile).save(buffer, 'PNG')
+                    tiles.append((self.text_lines[0], tile, color, ratio, bytes(buffer.data())))
+            self.warm_cache.save_tiles(entry, tiles)
+            self.warm_saved = state
+        except Exception as e:
+            log.error(f"保存预热缓存错误: {str(e)}")
+
+    def watch_file(self, file_path):
+        if self.file_watcher.files():
+            self.file_watcher.removePaths(self.file_watcher.files())
+        self.file_path = file_path
+        self.file_watcher.addPath(file_path)
+
+    def on_file_changed(self, path):
+        # 编辑器保存时常常连续触发多次，稍等片刻再重新加载
+        self.reload_timer.start(300)
+
+    def start_reload(self):
+        try:
+            if not self.file_path or not os.path.exists(self.file_path):
+                return
+            # 先保存再替换文件的编辑器会让监视失效，需要重新添加
+            if self.file_path not in self.file_watcher.files():
+                self.file_watcher.addPath(self.file_path)
+            # 上一次改动还在比较或尚未应用时稍后再试，保证每次都与当前内容比较
+            if self.pending_reload or (self.reload_thread and self.reload_thread.is_alive()):
+                self.reload_timer.start(300)
+                return
+            if self.scheduler is not None:
+                target, args = self.prepare_catalog_reload, (self.file_path, self.text_lines)
+            else:
+                target, args = self.prepare_reload, (self.file_path, self.text_lines, self.layout_width())
+            self.reload_thread = threading.Thread(target=target, args=args, daemon=True)
+            self.reload_thread.start()
+        except Exception as e:
+            log.error(f"重新加载文本文件错误: {str(e)}")
+
+    def prepare_reload(self, file_path, old_lines, layout_width):
+        """在后台线程中加载新文件并与当前内容比较差异"""
+        try:
+            new_source = MappedTextFile(file_path)
+            new_source.wait()
+            if isinstance(old_lines, MappedTextFile):
+                # 两边都是映射文件时直接比较原始字节，不需要解码
+                old_lines.wait()
+                opcodes, changed = diff_lines(old_lines, new_source, old_lines.raw, new_source.raw)
+            else:
+                opcodes, changed = diff_lines(old_lines, new_source)
+            if changed == 0 and len(old_lines) == len(new_source):
+                new_source.close()
+                return
+            layout = self.prepare_layout(opcodes, new_source, layout_width)
+            # 快照复制时已计算新内容的键，应用改动后按新内容写入预热缓存
+            self.pending_reload = (old_lines, new_source, opcodes, new_source.content_key, None, layout)
+            # 没有内容时时钟可能已停止，唤醒后由下一帧应用
+            self.frame_clock.wake_requested.emit()
+            log.info(f"检测到文本文件变化：{changed} 行新增或修改，共 {len(new_source)} 行，将在下一行切换时应用")
+        except Exception as e:
+            log.error(f"比较文本文件差异错误: {str(e)}")
+
+    def prepare_catalog_reload(self, file_path, old_lines):
+        """在后台线程中重新读取广告目录并建立新的调度器；差异操作为 None 表示整体替换目录"""
+        try:
+            # 先计算哈希再读取；两者之间文件又被修改时会再触发一次重新加载
+            key = startup_profile.content_key(file_path) if self.warm_cache else None
+            entries = rotation.read_catalog(file_path)
+            if key is not None:
+                key = (key[0], len(entries))
+            self.pending_reload = (old_lines, self.scheduler.reloaded(entries), None, key, None, None)
+            self.frame_clock.wake_requested.emit()
+            log.info(f"检测到广告目录变化：共 {len(entries)} 条，将在下一条广告开始时应用")
+        except Exception as e:
+            log.error(f"读取广告目录错误: {str(e)}")
+
+    def prepare_layout(self, opcodes, new_lines, layout_width):
+        """在后台线程中按差异结果准备新的测量结果和滚动带，应用时直接换用，不在界面线程中逐行重排
+
+        返回 (字体键, 宽度数组, 高度数组, 滚动带)；应用前字体或行间距已变化时不使用。
+        """
+        metrics_index = self.metrics_index
+        measurer = TextMetricsIndex()
+        measurer.reset(QFont(metrics_index.layouts.font))
+        # 映射文件的行缓存不是线程安全的，直接从映射中解码
+        get_line = new_lines._decode if isinstance(new_lines, MappedTextFile) else new_lines.__getitem__
+        widths, heights = metrics_index.diffed(opcodes, get_line, measurer)
+        timeline = ScrollTimeline(layout_width)
+        for width in widths:
+            timeline.append(width)
+        return metrics_index.font_key, widths, heights, timeline
+
+    def replace_catalog(self, scheduler):
+        """换用后台建立的调度器替换广告目录：保留播放记录，已经排好的播放序列按文本换算到新目录的行号"""
+        if not scheduler.catch_up(self.scheduler):
+            # 建立期间选出的条目太多无法补上，在这里重新载入
+            self.scheduler.load(scheduler.entries)
+            scheduler = self.scheduler
+        texts = [entry['text'] for entry in scheduler.entries]
+        positions = dict(scheduler.positions)
+        slot_lines = array('l')
+        for index in self.slot_lines:
+            text = self.text_lines[index]
+            if text not in positions:
+                # 已从目录删除但已排好的广告照常播完，只是不再被选中
+                positions[text] = len(texts)
+                texts.append(text)
+            slot_lines.append(positions[text])
+        self.scheduler = scheduler
+        # 已测量的广告按文本沿用原来的测量结果，新增或修改的广告被选中时再测量
+        self.metrics_index.remap(self.text_lines, positions)
+        self.text_lines = texts
+        self.slot_lines = slot_lines
+        self.content_key = None  # 由调用方设置新内容的键
+        self.update_segments()
+
+    def apply_pending_reload(self):
+        """应用后台准备好的文件改动"""
+        try:
+            old_lines, new_source, opcodes, key, commands, layout = self.pending_reload
+            self.pending_reload = None
+            if old_lines is not self.text_lines:
+                # 比较期间文本已被其他方式修改，差异作废，重新比较
+                if commands is not None:
+                    # 控制命令按当前文本重新准备
+                    self.queued_line_commands[:0] = commands
+                    return
+                if opcodes is not None:
+                    new_source.close()
+                self.reload_timer.start(0)
+                return
+            if opcodes is None:
+                self.replace_catalog(new_source)
+                self.content_key = key
+                if self.warm_cache is not None:
+                    self.warm_save_timer.start()
+                log.info(f"已应用广告目录改动，共 {len(self.scheduler)} 条")
+                return
+            self.replace_lines(new_source, opcodes, layout)
+            self.content_key = key
+            if commands is not None:
+                log.info(f"已应用控制接口的文本改动，共 {len(self.text_lines)} 行，当前为第 {self.current_line + 1} 行")
+                return
+            if self.warm_cache is not None:
+                self.warm_save_timer.start()
+            log.info(f"已应用文本文件改动，当前为第 {self.current_line + 1} 行")
+        except Exception as e:
+            log.error(f"应用文本文件改动错误: {str(e)}")
+
+    def replace_lines(self, new_lines, opcodes, layout=None):
+        """按差异结果替换全部文本行，保持当前行的屏幕位置不变；layout 为后台准备好的排布（见 prepare_layout）"""
+        old_line = self.current_line
+        current_x = self.segments[0][1] if self.segments else None
+        # 把当前行映射到新内容中的行号；当前行被修改时映射到修改后的行
+        new_line = 0
+        for tag, i1, i2, j1, j2 in opcodes:
+            if i1 <= old_line < i2:
+                new_line = j1 + (old_line - i1 if tag == 'equal' else 0)
+                break
+        new_line = min(new_line, max(0, len(new_lines) - 1))
+        # 后台准备排布后字体或行间距又变化了，改为在这里重排
+        if layout is not None and (layout[0] != self.metrics_index.font_key
+                                   or layout[3].viewport_width != float(self.layout_width())):
+            layout = None
+        # 未变化的行沿用原有测量结果，分块位图按文本内容缓存，也可直接复用
+        if layout is None:
+            self.metrics_index.apply_diff(opcodes, new_lines)
+        else:
+            self.metrics_index.widths, self.metrics_index.heights = layout[1], layout[2]
+        old_lines = self.text_lines
+        self.text_lines = new_lines
+        self.content_key = None  # 由调用方设置新内容的键
+        if hasattr(old_lines, 'close'):
+            old_lines.close()
+        if layout is None:
+            self.rebuild_timeline(new_line + 1)
+        else:
+            self.timeline = layout[3]
+            self.ensure_layout(0, new_line + 1)
+        if current_x is None or not len(self.text_lines):
+            self.restart_line(new_line)
+        else:
+            self.current_line = new_line
+            self.scroll_pos = self.timeline.starts[new_line] - current_x
+            self.update_segments()
+
+    def apply_line_commands(self, commands):
+        """排队一批增删行的命令；新内容和差异在后台线程准备，在下一行切换时应用"""
+        try:
+            if self.scheduler is not None:
+                log.warning("轮播模式下不支持增删行命令，请修改广告目录文件")
+                return
+            self.queued_line_commands.extend(commands)
+            self.start_line_commands()
+        except Exception as e:
+            log.error(f"应用文本命令错误: {str(e)}")
+
+    def start_line_commands(self):
+        """后台线程空闲且没有待应用的改动时，开始准备排队的增删行命令"""
+        try:
+            if (not self.queued_line_commands or self.pending_reload
+                    or (self.reload_thread and self.reload_thread.is_alive())):
+                return
+            commands, self.queued_line_commands = self.queued_line_commands, []
+            self.reload_thread = threading.Thread(target=self.prepare_line_commands,
+                                                  args=(self.text_lines, commands, self.layout_width()), daemon=True)
+            self.reload_thread.start()
+        except Exception as e:
+            log.error(f"准备文本命令错误: {str(e)}")
+
+    def prepare_line_commands(self, old_lines, commands, layout_width):
+        """在后台线程中按命令生成新的文本行，并与当前内容比较差异"""
+        try:
+            if isinstance(old_lines, MappedTextFile):
+                # 映射文件的行缓存不是线程安全的，直接从映射中解码
+                old_lines.wait()
+                old_snapshot = [old_lines._decode(index) for index in range(len(old_lines))]
+            else:
+                old_snapshot = old_lines
+            lines = list(old_snapshot)
+            for command in commands:
+                name = command['cmd']
+                try:
+                    if name == 'add_line':
+                        lines.insert(command.get('index', len(lines)), str(command['text']).strip())
+                    elif name == 'remove_line':
+                        if 'index' in command:
+                            if 0 <= command['index'] < len(lines):
+                                del lines[command['index']]
+                        elif command.get('text') in lines:
+                            lines.remove(command['text'])
+                    elif name == 'set_lines':
+                        lines = [str(line).strip() for line in command['lines']]
+                except Exception as e:
+                    log.error(f"应用文本命令 {name} 错误: {str(e)}")
+            opcodes, changed = diff_lines(old_snapshot, lines)
+            if changed == 0 and len(old_snapshot) == len(lines):
+                return
+            layout = self.prepare_layout(opcodes, lines, layout_width)
+            self.pending_reload = (old_lines, lines, opcodes, None, commands, layout)
+            self.frame_clock.wake_requested.emit()
+            log.info(f"控制接口更新了文本：{changed} 行新增或修改，共 {len(lines)} 行，将在下一行切换时应用")
+        except Exception as e:
+            log.error(f"准备文本命令错误: {str(e)}")
+
+class ControlRequestHandler(socketserver.StreamRequestHandler):
+    """每个连接中每行一个JSON命令，逐行回复是否已排队"""
+    def handle(self):
+        for raw in self.rfile:
+            reply = self.server.control.enqueue(raw)
+            self.wfile.write((json.dumps(reply, ensure_ascii=False) + '\n').encode('utf-8'))
+
+class ControlServer:
+    """本地控制接口：后台线程接收命令并排队，由界面线程在帧边界批量应用"""
+    LINE_COMMANDS = {'add_line', 'remove_line', 'set_lines'}
+    SETTING_COMMANDS = {'set_speed', 'set_font', 'set_font_size', 'set_color', 'set_frame_rate'}
+
+    def __init__(self, host='127.0.0.1', port=8765, on_command=None):
+        self.commands = queue.SimpleQueue()
+        self.on_command = on_command  # 收到命令后在后台线程中调用，用于唤醒已停止的帧时钟
+        self.server = socketserver.ThreadingTCPServer((host, port), ControlRequestHandler,
+                                                      bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.server.control = self
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def enqueue(self, raw):
+        """校验一行命令并放入队列，返回给客户端的回复"""
+        try:
+            command = json.loads(raw)
+        except ValueError as e:
+            return {'ok': False, 'error': f'无效的JSON: {e}'}
+        if not isinstance(command, dict) or command.get('cmd') not in self.LINE_COMMANDS | self.SETTING_COMMANDS:
+            return {'ok': False, 'error': '未知命令'}
+        error = self.check_command(command)
+        if error:
+            return {'ok': False, 'error': error}
+        self.commands.put(command)
+        if self.on_command:
+            self.on_command()
+        return {'ok': True, 'queued': command['cmd']}
+
+    @staticmethod
+    def check_command(command):
+        """检查命令各字段的类型和取值，返回错误说明，合法时返回 None"""
+        def is_int(value):
+            return isinstance(value, int) and not isinstance(value, bool)
+
+        def is_number(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        name = command['cmd']
+        if not is_int(command.get('lane', 0)):
+            return 'lane 必须是整数'
+        if name == 'add_line':
+            if not isinstance(command.get('text'), str):
+                return 'add_line 需要字符串 text'
+            if 'index' in command and not is_int(command['index']):
+                return 'index 必须是整数'
+        elif name == 'remove_line':
+            if 'index' in command:
+                if not is_int(command['index']):
+                    return 'index 必须是整数'
+            elif not isinstance(command.get('text'), str):
+                return 'remove_line 需要整数 index 或字符串 text'
+        elif name == 'set_lines':
+            lines = command.get('lines')
+            if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+                return 'set_lines 需要字符串列表 lines'
+        elif name == 'set_speed':
+            if not is_number(command.get('value')) or command['value'] <= 0:
+                return 'set_speed 需要正数 value'
+        elif name == 'set_font_size':
+            if not is_int(command.get('value')) or command['value'] <= 0:
+                return 'set_font_size 需要正整数 value'
+        elif name == 'set_font':
+            if 'family' not in command and 'size' not in command:
+                return 'set_font 需要 family 或 size'
+            if 'family' in command and not isinstance(command['family'], str):
+                return 'family 必须是字符串'
+            if 'size' in command and (not is_int(command['size']) or command['size'] <= 0):
+                return 'size 必须是正整数'
+        elif name == 'set_color':
+            if not isinstance(command.get('value'), str) or not QColor.isValidColor(command['value']):
+                return 'set_color 需要有效的颜色 value'
+        elif name == 'set_frame_rate':
+            if not is_int(command.get('value')) or command['value'] < 0:
+                return 'set_frame_rate 需要非负整数 value'
+        return None
+
+    def drain(self):
+        commands = []
+        while True:
+            try:
+                commands.append(self.commands.get_nowait())
+            except queue.Empty:
+                return commands
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
 
 class ControlPanel(QWidget):
     def __init__(self, parent=None):
@@ -255,13 +1771,23 @@ class ControlPanel(QWidget):
         layout = QHBoxLayout(self)
         layout.setContentsMargins(10, 5, 10, 5)
         
+        # 轨道选择：下面的控件作用于当前选中的轨道
+        lane_layout = QVBoxLayout()
+        lane_label = QLabel('轨道:', self)
+        self.lane_combo = QComboBox(self)
+        lane_layout.addWidget(lane_label)
+        lane_layout.addWidget(self.lane_combo)
+        
+        # 添加轨道按钮
+        self.add_lane_button = QPushButton('添加轨道', self)
+        
         # 速度控制
         speed_layout = QVBoxLayout()
-        speed_label = QLabel('速度:', self)
+        speed_label = QLabel('速度(像素/秒):', self)
         self.speed_slider = QSlider(Qt.Horizontal, self)
-        self.speed_slider.setMinimum(1)
-        self.speed_slider.setMaximum(10)
-        self.speed_slider.setValue(2)
+        self.speed_slider.setMinimum(10)
+        self.speed_slider.setMaximum(600)
+        self.speed_slider.setValue(60)
         speed_layout.addWidget(speed_label)
         speed_layout.addWidget(self.speed_slider)
         
@@ -275,6 +1801,15 @@ class ControlPanel(QWidget):
         size_layout.addWidget(size_label)
         size_layout.addWidget(self.size_slider)
         
+        # 帧率选择
+        fps_layout = QVBoxLayout()
+        fps_label = QLabel('帧率:', self)
+        self.fps_combo = QComboBox(self)
+        for fps in FrameClock.FRAME_RATES:
+            self.fps_combo.addItem(f'{fps} FPS' if fps else '跟随显示器', fps)
+        fps_layout.addWidget(fps_label)
+        fps_layout.addWidget(self.fps_combo)
+        
         # 字体选择按钮
         self.font_button = QPushButton('选择字体', self)
         
@@ -282,13 +1817,22 @@ class ControlPanel(QWidget):
         self.color_button = QPushButton('选择颜色', self)
         
         # 添加控件到布局
+        layout.addLayout(lane_layout)
+        layout.addWidget(self.add_lane_button)
         layout.addLayout(speed_layout)
         layout.addLayout(size_layout)
+        layout.addLayout(fps_layout)
         layout.addWidget(self.font_button)
         layout.addWidget(self.color_button)
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    SYNC_INTERVAL = 0.2  # 主实例发布同步状态的间隔（秒）
+    HOVER_COLOR = QColor(26, 26, 26, 200)  # 鼠标悬停时的半透明背景
+    HOVER_FADE_DURATION = 0.15  # 悬停背景淡入淡出的时长（秒）
+
+    def __init__(self, control_port=None, shm_path=None, stats_file=None, stats_interval=5.0,
+                 stats_overlay=False, lane_files=None, sync_mode=None, sync_address=scroll_sync.DEFAULT_ADDRESS,
+                 sync_offset=0.0, profile_path=None):
         try:
             super(MainWindow, self).__init__()
             self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
@@ -306,6 +1850,21 @@ class MainWindow(QMainWindow):
             self.dragging = False
             self.offset = None
             
+            # 悬停背景的不透明程度（0到1），在帧时钟上向目标值渐变，绘制时叠加
+            self.hover_level = 0.0
+            self.hover_target = 0.0
+            self.last_hover_tick = None
+            
+            # 启动配置（可选）：恢复上次的文本文件和设置，设置变化后延迟保存
+            self.profile_path = profile_path
+            self.profile = startup_profile.load_profile(profile_path) if profile_path else {}
+            self.warm_cache = startup_profile.WarmCache() if profile_path else None
+            self.profile_timer = QTimer(self)
+            self.profile_timer.setSingleShot(True)
+            self.profile_timer.setInterval(1000)
+            self.profile_timer.timeout.connect(self.save_profile)
+            self.startup_reported = False
+            
             # 创建主窗口部件
             self.central_widget = QWidget()
             self.setCentralWidget(self.central_widget)
@@ -321,10 +1880,17 @@ class MainWindow(QMainWindow):
             self.label_container.setFixedWidth(2500)  # 设置固定宽度
             # 设置标签容器背景透明
             self.label_container.setAttribute(Qt.WA_TranslucentBackground)
-            
-            # 创建标签
-            self.label = LyricLabel(self.label_container)
-            self.label.setParent(self.label_container)  # 设置父容器
+            # 多条字幕轨道上下排列，共用一个帧时钟和分块位图缓存
+            self.lanes_layout = QVBoxLayout(self.label_container)
+            self.lanes_layout.setContentsMargins(0, 0, 0, 0)
+            self.lanes_layout.setSpacing(0)
+            self.frame_clock = FrameClock(30, self)
+            # 控制命令在各轨道推进之前应用，先于轨道连接到帧时钟
+            self.control_server = None
+            self.frame_clock.frame.connect(self.apply_control_commands)
+            self.pixmap_cache = PixmapCache()
+            self.lanes = []
+            self.label = None  # 当前选中的轨道，控制面板作用于它
             
             # 添加标签容器到主布局
             self.layout.addWidget(self.label_container)
@@ -333,18 +1899,18 @@ class MainWindow(QMainWindow):
             self.control_panel = ControlPanel(self)
             self.layout.addWidget(self.control_panel)
             
-            # 根据初始字体大小设置正确的高度
-            font_metrics = self.label.fontMetrics()
-            # 使用height()而不是lineSpacing()，确保包含字体的上升和下降部分
-            label_height = font_metrics.height() + 10
-            control_panel_height = 60
-            padding = 20
-            self.label_container.setMinimumHeight(label_height)
-            self.label_container.setFixedHeight(label_height)
-            initial_height = label_height + control_panel_height + padding
-            
-            # 设置窗口大小
-            self.resize(2500, initial_height)  # 使用计算出的高度
+            # 创建第一条轨道，并根据字体大小设置正确的高度
+            # 命令行没有指定文件时按配置恢复各轨道的文件和设置
+            lanes = [(file_path, None) for file_path in lane_files or []]
+            if not lanes:
+                lanes = [(settings.get('file'), settings) for settings in self.profile.get('lanes', [])]
+            restored = False
+            for file_path, settings in lanes or [(None, None)]:
+                if file_path and not os.path.exists(file_path):
+                    log.warning(f"配置中的文本文件不存在: {file_path}")
+                    file_path = None
+                restored = restored or bool(file_path)
+                self.add_lane(file_path, settings)
             
             # 初始隐藏控制面板
             self.control_panel.hide()
@@ -355,16 +1921,26 @@ class MainWindow(QMainWindow):
             self.central_widget.installEventFilter(self)
             
             # 连接信号
+            self.control_panel.lane_combo.currentIndexChanged.connect(self.select_lane)
+            self.control_panel.add_lane_button.clicked.connect(self.add_lane_from_dialog)
             self.control_panel.speed_slider.valueChanged.connect(self.update_speed)
             self.control_panel.size_slider.valueChanged.connect(self.update_font_size)
+            self.control_panel.fps_combo.currentIndexChanged.connect(self.update_frame_rate)
             self.control_panel.font_button.clicked.connect(self.choose_font)
             self.control_panel.color_button.clicked.connect(self.choose_color)
             
-            # 加载文本文件
-            self.load_text_file()
+            selected = self.profile.get('selected_lane', 0)
+            if 0 <= selected < len(self.lanes):
+                self.control_panel.lane_combo.setCurrentIndex(selected)
+                self.select_lane(selected)
             
-            # 居中显示
+            # 加载文本文件（命令行或配置已指定各轨道的文件时不再弹出对话框）
+            if not lane_files and not restored:
+                self.load_text_file()
+            
+            # 居中显示，配置中保存了窗口位置时恢复到原来的位置
             self.center_window()
+            self.restore_window_position()
             
             # 确保窗口显示在最前面
             self.activateWindow()
@@ -387,11 +1963,33 @@ class MainWindow(QMainWindow):
             self.hide_timer.timeout.connect(self.check_and_hide_controls)
             
             # 确保标签显示
-            self.label.show()
+            for lane in self.lanes:
+                lane.show()
             self.label_container.show()
+            
+            # 本地控制接口（可选）
+            if control_port is not None:
+                self.start_control_server(control_port)
+            # 帧时间统计（可选）；各轨道共用帧时钟，只在第一条轨道上统计
+            if stats_file or stats_overlay:
+                self.lanes[0].enable_stats(stats_file, stats_interval, stats_overlay)
+            # 共享内存帧输出（可选）
+            self.frame_ring = None
+            if shm_path:
+                self.start_frame_ring(shm_path)
+            # 多实例同步（可选）
+            self.sync_publisher = None
+            self.sync_listener = None
+            if sync_mode:
+                self.start_sync(sync_mode, sync_address, sync_offset)
+            # 悬停背景的淡入淡出与滚动在同一帧推进
+            self.frame_clock.frame.connect(self.advance_hover)
+            # 每帧结束时按内容、可见性和速度调整帧时钟模式（停止、降频或全速）
+            self.frame_clock.frame.connect(self.update_clock_mode)
+            self.frame_clock.frame.connect(self.report_startup)
+            self.update_clock_mode()
         except Exception as e:
-            print(f"MainWindow初始化错误: {str(e)}")
-            print(traceback.format_exc())
+            log.exception(f"MainWindow初始化错误: {str(e)}")
             QMessageBox.critical(None, "错误", f"程序初始化失败: {str(e)}")
             raise
 
@@ -401,22 +1999,23 @@ class MainWindow(QMainWindow):
                 self.dragging = True
                 self.offset = event.pos()
         except Exception as e:
-            print(f"鼠标按下事件错误: {str(e)}")
+            log.error(f"鼠标按下事件错误: {str(e)}")
 
     def mouseMoveEvent(self, event):
         try:
             if self.dragging and self.offset:
                 self.move(self.mapToGlobal(event.pos() - self.offset))
         except Exception as e:
-            print(f"鼠标移动事件错误: {str(e)}")
+            log.error(f"鼠标移动事件错误: {str(e)}")
 
     def mouseReleaseEvent(self, event):
         try:
             if event.button() == Qt.LeftButton:
                 self.dragging = False
                 self.offset = None
+                self.schedule_profile_save()
         except Exception as e:
-            print(f"鼠标释放事件错误: {str(e)}")
+            log.error(f"鼠标释放事件错误: {str(e)}")
 
     def center_window(self):
         try:
@@ -426,134 +2025,613 @@ class MainWindow(QMainWindow):
             y = (screen.height() - size.height()) // 2
             self.move(x, y)
         except Exception as e:
-            print(f"居中窗口错误: {str(e)}")
+            log.error(f"居中窗口错误: {str(e)}")
+
+    def choose_text_file(self):
+        """弹出文件选择对话框，取消时返回空字符串"""
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getOpenFileName(self, '打开文本文件', '', '文本文件 (*.txt);;广告目录 (*.jsonl)', options=options)
+        return file_path
 
     def load_text_file(self):
         try:
-            options = QFileDialog.Options()
-            file_path, _ = QFileDialog.getOpenFileName(self, '打开文本文件', '', '文本文件 (*.txt)', options=options)
+            file_path = self.choose_text_file()
             if file_path:
                 self.label.load_text_from_file(file_path)
+                self.update_clock_mode()
+                self.schedule_profile_save()
         except Exception as e:
-            print(f"加载文件错误: {str(e)}")
+            log.error(f"加载文件错误: {str(e)}")
             self.label.setText("")
             
+    def add_lane(self, file_path=None, settings=None):
+        """添加一条字幕轨道，拥有独立的文本、速度、字体和颜色；settings 为配置中保存的轨道设置"""
+        try:
+            container = QWidget(self.label_container)
+            container.setAttribute(Qt.WA_TranslucentBackground)
+            container.setFixedWidth(2500)
+            lane = LyricLabel(container, self.frame_clock, self.pixmap_cache)
+            # 字体在后台渲染完成、交换后行高才变化
+            lane.font_applied.connect(self.update_window_height)
+            lane.font_applied.connect(self.schedule_profile_save)
+            lane.warm_cache = self.warm_cache
+            self.lanes_layout.addWidget(container)
+            self.lanes.append(lane)
+            lane.show()
+            self.control_panel.lane_combo.addItem(f'轨道 {len(self.lanes)}')
+            self.control_panel.lane_combo.setCurrentIndex(len(self.lanes) - 1)
+            self.label = lane
+            if settings:
+                # 加载文本之前应用字体，预热缓存按该字体查找；设置有误时仍然加载文本
+                try:
+                    self.apply_lane_settings(lane, settings)
+                except Exception as e:
+                    log.error(f"应用轨道设置错误: {str(e)}")
+            self.update_window_height()
+            if file_path:
+                lane.load_text_from_file(file_path)
+                self.update_clock_mode()
+            self.schedule_profile_save()
+            return lane
+        except Exception as e:
+            log.error(f"添加轨道错误: {str(e)}")
+
+    def apply_lane_settings(self, lane, settings):
+        """应用配置中保存的轨道设置：字体、字号、颜色、速度和轮次间距"""
+        font = QFont(lane.current_font)
+        if 'font' in settings:
+            font.fromString(settings['font'])
+        if 'font_size' in settings:
+            font.setPointSize(int(settings['font_size']))
+        lane.set_font(font)
+        if 'color' in settings and QColor(settings['color']).isValid():
+            lane.set_text_color(QColor(settings['color']))
+        if 'speed' in settings:
+            lane.set_speed(settings['speed'])
+        if 'cycle_spacing' in settings:
+            lane.cycle_spacing = int(settings['cycle_spacing'])
+
+    def restore_window_position(self):
+        """恢复配置中保存的窗口位置；该位置已不在任何屏幕上时保持居中"""
+        window = self.profile.get('window')
+        if window and QApplication.screenAt(QPoint(window['x'], window['y'])) is not None:
+            self.move(window['x'], window['y'])
+
+    def schedule_profile_save(self):
+        """设置变化后延迟保存配置，连续修改只写一次"""
+        if self.profile_path:
+            self.profile_timer.start()
+
+    def save_profile(self):
+        """保存当前设置到配置；预热缓存只在加载后和关闭时写入，修改设置时不写入"""
+        if not self.profile_path:
+            return
+        try:
+            self.profile_timer.stop()
+            profile = {
+                'window': {'x': self.x(), 'y': self.y()},
+                'selected_lane': self.lanes.index(self.label) if self.label in self.lanes else 0,
+                'lanes': [{
+                    'file': os.path.abspath(lane.file_path) if lane.file_path else None,
+                    'font': (lane.requested_font or lane.current_font).toString(),
+                    'font_size': lane.font_size,
+                    'color': lane.text_color.name(QColor.HexArgb),
+                    'speed': lane.speed,
+                    'cycle_spacing': lane.cycle_spacing,
+                } for lane in self.lanes],
+            }
+            startup_profile.save_profile(self.profile_path, profile)
+        except Exception as e:
+            log.error(f"保存配置错误: {str(e)}")
+
+    def report_startup(self, now):
+        """第一次有文字滚动进入视口时输出启动耗时"""
+        if self.startup_reported:
+            return
+        if not any(lane.segments and lane.segments[0][1] < lane.viewport_width() for lane in self.lanes):
+            return
+        self.startup_reported = True
+        startup_ms = (time.perf_counter() - PROCESS_STARTED) * 1000
+        log.info(f"启动耗时 {startup_ms:.0f} ms（从进程启动到第一帧滚动文字）",
+                 extra={'fields': {'startup_ms': round(startup_ms, 1)}})
+        if self.lanes[0].stats:
+            self.lanes[0].stats.startup_ms = round(startup_ms, 1)
+
+    def add_lane_from_dialog(self):
+        try:
+            # 选好文件后才创建轨道，取消对话框时不留下空轨道
+            file_path = self.choose_text_file()
+            if file_path:
+                self.add_lane(file_path)
+        except Exception as e:
+            log.error(f"添加轨道错误: {str(e)}")
+
+    def select_lane(self, index):
+        """切换控制面板作用的轨道，并把滑块同步为该轨道的设置"""
+        try:
+            if not 0 <= index < len(self.lanes):
+                return
+            self.label = self.lanes[index]
+            self.schedule_profile_save()
+            for slider, value in ((self.control_panel.speed_slider, self.label.speed),
+                                  (self.control_panel.size_slider, self.label.font_size)):
+                slider.blockSignals(True)
+                slider.setValue(int(value))
+                slider.blockSignals(False)
+        except Exception as e:
+            log.error(f"切换轨道错误: {str(e)}")
+
+    def update_window_height(self):
+        """按各轨道的行高调整轨道容器、标签容器和窗口高度"""
+        # 使用度量索引中缓存的行高，确保包含字体的上升和下降部分，避免文字被截断
+        label_height = 0
+        for lane in self.lanes:
+            lane_height = lane.metrics_index.line_height + 10  # 实际字体高度加边距
+            lane.parent().setFixedHeight(lane_height)
+            label_height += lane_height
+        control_panel_height = 60  # 控制面板固定高度
+        padding = 20  # 上下边距
+        
+        # 设置标签容器的最小高度和固定高度
+        self.label_container.setMinimumHeight(label_height)
+        self.label_container.setFixedHeight(label_height)
+        
+        # 设置窗口的最小高度并调整窗口大小
+        min_window_height = label_height + control_panel_height + padding
+        self.setMinimumHeight(min_window_height)
+        self.resize(2500, min_window_height)
+        
+        # 确保标签位置更新（垂直居中）
+        for lane in self.lanes:
+            lane.update_position()
+
+    def update_clock_mode(self, now=None):
+        try:
+            # 悬停背景渐变期间即使没有内容也要继续走时，并且按目标帧率运行，不因滚动慢而降频
+            fading = self.hover_level != self.hover_target
+            max_speed = math.inf if fading else max((lane.speed for lane in self.lanes), default=0)
+            self.frame_clock.set_activity(fading or any(lane.has_content() for lane in self.lanes),
+                                          self.is_output_visible(), max_speed)
+        except Exception as e:
+            log.error(f"更新帧时钟模式错误: {str(e)}")
+
+    def is_output_visible(self):
+        """窗口最小化、隐藏或被完全遮挡时无需绘制；输出共享内存帧时始终需要"""
+        if getattr(self, 'frame_ring', None):
+            return True
+        if not self.isVisible() or self.isMinimized():
+            return False
+        handle = self.windowHandle()
+        return handle is None or handle.isExposed()
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            self.update_clock_mode()
+        super().changeEvent(event)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # 窗口被遮挡或重新露出时平台发送 Expose 事件
+        self.windowHandle().installEventFilter(self)
+        self.update_clock_mode()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_clock_mode()
+
     def update_speed(self, value):
         try:
             self.label.set_speed(value)
+            self.schedule_profile_save()
         except Exception as e:
-            print(f"更新速度错误: {str(e)}")
+            log.error(f"更新速度错误: {str(e)}")
+
+    def update_frame_rate(self, index):
+        try:
+            fps = self.control_panel.fps_combo.itemData(index)
+            self.frame_clock.set_fps(fps)
+        except Exception as e:
+            log.error(f"更新帧率错误: {str(e)}")
 
     def update_font_size(self, value):
         try:
-            # 更新标签字体大小（这会自动更新标签高度）
+            # 更新标签字体大小：在后台渲染，拖动滑块时只渲染最新的大小，完成后自动更新窗口高度
             self.label.set_font_size(value)
             
-            # 使用字体度量获取实际渲染高度
-            font_metrics = self.label.fontMetrics()
-            # 使用height()确保包含字体的上升和下降部分，避免文字被截断
-            label_height = font_metrics.height() + 10  # 实际字体高度加边距
-            control_panel_height = 60  # 控制面板固定高度
-            padding = 20  # 上下边距
-            
-            # 设置标签容器的最小高度和固定高度
-            self.label_container.setMinimumHeight(label_height)
-            self.label_container.setFixedHeight(label_height)
-            
-            # 设置窗口的最小高度
-            min_window_height = label_height + control_panel_height + padding
-            self.setMinimumHeight(min_window_height)
-            
-            # 调整窗口大小
-            self.resize(2500, min_window_height)
-            
-            # 确保标签位置更新（垂直居中）
-            self.label.update_position()
-            
             # 确保窗口显示在最前面
             self.raise_()
         except Exception as e:
-            print(f"更新字体大小错误: {str(e)}")
+            log.error(f"更新字体大小错误: {str(e)}")
         
     def choose_color(self):
         try:
             color = QColorDialog.getColor()
             if color.isValid():
                 self.label.set_text_color(color)
+                self.schedule_profile_save()
         except Exception as e:
-            print(f"选择颜色错误: {str(e)}")
+            log.error(f"选择颜色错误: {str(e)}")
 
     def choose_font(self):
         try:
             font, ok = QFontDialog.getFont(self.label.current_font, self)
             if ok:
-                self.label.set_font(font)
-                # 字体改变后，同步更新容器和窗口高度
-                font_metrics = self.label.fontMetrics()
-                # 使用height()确保包含字体的上升和下降部分
-                label_height = font_metrics.height() + 10
-                control_panel_height = 60
-                padding = 20
-                self.label_container.setMinimumHeight(label_height)
-                self.label_container.setFixedHeight(label_height)
-                min_window_height = label_height + control_panel_height + padding
-                self.setMinimumHeight(min_window_height)
-                self.resize(2500, min_window_height)
-                # 确保标签位置更新（垂直居中）
-                self.label.update_position()
-        except Exception as e:
-            print(f"选择字体错误: {str(e)}")
+                self.apply_font(font)
+        except Exception as e:
+            log.error(f"选择字体错误: {str(e)}")
+
+    def apply_font(self, font, lane=None):
+        try:
+            # 字体交换后由 font_applied 信号同步更新容器和窗口高度
+            (lane or self.label).set_font(font)
+        except Exception as e:
+            log.error(f"设置字体错误: {str(e)}")
+
+    def start_control_server(self, port):
+        """启动本地控制接口，收到的命令在每帧开始前批量应用"""
+        try:
+            self.control_server = ControlServer(port=port, on_command=self.frame_clock.wake_requested.emit)
+            log.info(f"控制接口已启动: 127.0.0.1:{self.control_server.port}")
+        except Exception as e:
+            log.error(f"启动控制接口错误: {str(e)}")
+
+    def apply_control_commands(self, now):
+        """取出这段时间内排队的全部命令，在各轨道推进之前一次性应用"""
+        if self.control_server is None:
+            return
+        try:
+            commands = self.control_server.drain()
+            if not commands:
+                return
+            # 命令按 lane 字段（默认第一条）分给各轨道；帧率作用于共用的帧时钟，与 lane 无关
+            for index in sorted({command.get('lane', 0) for command in commands}):
+                if not 0 <= index < len(self.lanes):
+                    log.warning(f"控制命令指定的轨道不存在: {index}")
+                    continue
+                self.apply_lane_commands(self.lanes[index],
+                                         [command for command in commands if command.get('lane', 0) == index])
+            self.schedule_profile_save()
+        except Exception as e:
+            log.error(f"应用控制命令错误: {str(e)}")
+
+    def apply_lane_commands(self, lane, commands):
+        """在帧边界一次性应用某条轨道的一批命令"""
+        try:
+            line_commands = [command for command in commands if command['cmd'] in ControlServer.LINE_COMMANDS]
+            if line_commands:
+                lane.apply_line_commands(line_commands)
+            # 同类设置在一批中只应用最后一次
+            settings = {command['cmd']: command for command in commands
+                        if command['cmd'] not in ControlServer.LINE_COMMANDS}
+            for name, command in settings.items():
+                try:
+                    self.apply_setting_command(lane, name, command)
+                except Exception as e:
+                    log.error(f"应用控制命令 {name} 错误: {str(e)}")
+        except Exception as e:
+            log.error(f"应用控制命令错误: {str(e)}")
+
+    def apply_setting_command(self, lane, name, command):
+        """应用一条设置命令（字段已在接收时校验）"""
+        if name == 'set_speed':
+            lane.set_speed(command['value'])
+            if lane is self.label:
+                slider = self.control_panel.speed_slider
+                slider.blockSignals(True)
+                slider.setValue(int(command['value']))
+                slider.blockSignals(False)
+        elif name == 'set_font_size':
+            # 直接设置轨道；滑块已是该值时 setValue 不会触发信号，不能经由滑块设置
+            lane.set_font_size(int(command['value']))
+            if lane is self.label:
+                slider = self.control_panel.size_slider
+                slider.blockSignals(True)
+                slider.setValue(int(command['value']))
+                slider.blockSignals(False)
+        elif name == 'set_font':
+            font = QFont(lane.requested_font or lane.current_font)
+            if 'family' in command:
+                font.setFamily(command['family'])
+            if 'size' in command:
+                font.setPointSize(int(command['size']))
+            self.apply_font(font, lane)
+        elif name == 'set_color':
+            color = QColor(command['value'])
+            if color.isValid():
+                lane.set_text_color(color)
+        elif name == 'set_frame_rate':
+            index = self.control_panel.fps_combo.findData(int(command['value']))
+            if index >= 0:
+                self.control_panel.fps_combo.setCurrentIndex(index)
+            else:
+                self.frame_clock.set_fps(int(command['value']))
+
+    def start_frame_ring(self, path, max_height=256):
+        """每帧把所有轨道的画面（带透明通道）写入共享内存环形缓冲区，供合成软件直接读取"""
+        try:
+            max_height = max(max_height, self.label_container.height())
+            self.frame_ring = FrameRingWriter(path, self.label_container.width(), max_height)
+            self.frame_image = None
+            self.frame_clock.frame.connect(self.publish_frame)
+            log.info(f"共享内存帧输出: {path}")
+        except Exception as e:
+            log.error(f"启动共享内存帧输出错误: {str(e)}")
+
+    def publish_frame(self, now):
+        try:
+            size = self.label_container.size()
+            if self.frame_image is None or self.frame_image.size() != size:
+                self.frame_image = QImage(size, QImage.Format_ARGB32_Premultiplied)
+            image = self.frame_image
+            image.fill(Qt.transparent)
+            painter = QPainter(image)
+            for lane in self.lanes:
+                painter.save()
+                painter.translate(0, lane.parent().y())
+                lane.paint_content(painter)
+                painter.restore()
+            painter.end()
+            bits = image.constBits()
+            bits.setsize(image.sizeInBytes())
+            self.frame_ring.write(memoryview(bits), image.width(), image.height(), image.bytesPerLine(), now)
+        except Exception as e:
+            log.error(f"写入共享内存帧错误: {str(e)}")
+
+    def start_sync(self, mode, address, offset=0.0):
+        """主实例定期发布各轨道的周期起点和速度，跟随实例据此计算滚动位置"""
+        try:
+            if mode == 'leader':
+                self.sync_publisher = scroll_sync.SyncPublisher(address)
+                self.last_sync_publish = None
+                self.frame_clock.frame.connect(self.publish_sync)
+                log.info(f"多实例同步（主实例）: {address}")
+            else:
+                self.sync_listener = scroll_sync.SyncListener(address)
+                self.sync_offset = offset
+                self.frame_clock.frame.connect(self.receive_sync)
+                log.info(f"多实例同步（跟随，偏移 {offset:g}px）: {address}")
+        except Exception as e:
+            log.error(f"启动多实例同步错误: {str(e)}")
+
+    def publish_sync(self, now):
+        try:
+            if self.last_sync_publish is not None and now - self.last_sync_publish < self.SYNC_INTERVAL:
+                return
+            self.last_sync_publish = now
+            self.sync_publisher.publish([scroll_sync.lane_state(lane.scroll_pos, lane.speed, lane.layout_width(),
+                                                                lane.cycle_spacing)
+                                         for lane in self.lanes])
+        except Exception as e:
+            log.error(f"发布同步状态错误: {str(e)}")
+
+    def receive_sync(self, now):
+        try:
+            states = self.sync_listener.poll()
+            if not states:
+                return
+            for lane, state in zip(self.lanes, states):
+                lane.apply_sync_state(state, self.sync_offset)
+                if lane is self.label:
+                    slider = self.control_panel.speed_slider
+                    slider.blockSignals(True)
+                    slider.setValue(int(lane.speed))
+                    slider.blockSignals(False)
+        except Exception as e:
+            log.error(f"接收同步状态错误: {str(e)}")
+
+    def closeEvent(self, event):
+        self.save_profile()
+        for lane in self.lanes:
+            lane.save_warm_cache()
+        # 等待后台字体渲染任务结束，任务完成时轨道仍然存在
+        QThreadPool.globalInstance().waitForDone()
+        if self.control_server:
+            self.control_server.close()
+        if self.sync_publisher:
+            self.sync_publisher.close()
+        if self.sync_listener:
+            self.sync_listener.close()
+        if self.frame_ring:
+            self.frame_ring.close()
+        super().closeEvent(event)
 
     def check_and_hide_controls(self):
-        """检查鼠标是否真的离开了窗口，如果是则隐藏控制面板并恢复透明"""
+        """检查鼠标是否真的离开了窗口，如果是则淡出背景，淡出完成后隐藏控制面板"""
         try:
             if not self.underMouse() and not self.label_container.underMouse() and not self.control_panel.underMouse():
                 self.is_mouse_over = False
-                self.setStyleSheet("""
-                    QMainWindow {
-                        background-color: transparent;
-                    }
-                """)
-                self.label_container.setStyleSheet("background-color: transparent;")
+                self.set_hover(False)
+        except Exception as e:
+            log.error(f"检查隐藏控制面板错误: {str(e)}")
+
+    def set_hover(self, hovered):
+        """开始淡入或淡出悬停背景；不修改样式表，避免整棵控件树重新polish导致滚动卡顿"""
+        self.hover_target = 1.0 if hovered else 0.0
+        if hovered:
+            self.control_panel.show()
+        self.frame_clock.wake()
+
+    def advance_hover(self, now):
+        try:
+            if self.hover_level == self.hover_target:
+                self.last_hover_tick = None
+                return
+            elapsed = self.frame_clock.interval() if self.last_hover_tick is None else now - self.last_hover_tick
+            self.last_hover_tick = now
+            step = elapsed / self.HOVER_FADE_DURATION
+            if self.hover_target > self.hover_level:
+                self.hover_level = min(self.hover_target, self.hover_level + step)
+            else:
+                self.hover_level = max(self.hover_target, self.hover_level - step)
+            if self.hover_level == 0:
                 self.control_panel.hide()
+            self.update()
         except Exception as e:
-            print(f"检查隐藏控制面板错误: {str(e)}")
+            log.error(f"更新悬停背景错误: {str(e)}")
+
+    def paintEvent(self, event):
+        """按当前不透明程度绘制悬停背景，子控件随后绘制在其上"""
+        try:
+            if self.hover_level <= 0:
+                return
+            color = QColor(self.HOVER_COLOR)
+            color.setAlphaF(color.alphaF() * self.hover_level)
+            painter = QPainter(self)
+            painter.fillRect(self.rect(), color)
+            # 字幕区域再叠加一层，与窗口和标签容器各自设置背景时的效果一致
+            painter.fillRect(QRect(self.label_container.mapTo(self, QPoint(0, 0)), self.label_container.size()),
+                             color)
+            painter.end()
+        except Exception as e:
+            log.error(f"绘制悬停背景错误: {str(e)}")
     
     def eventFilter(self, obj, event):
         try:
+            if obj is self.windowHandle():
+                if event.type() == QEvent.Expose:
+                    self.update_clock_mode()
+                return False
             if obj == self.label_container or obj == self.control_panel or obj == self.central_widget:
                 if event.type() == event.Enter:
-                    # 鼠标进入时取消隐藏定时器，显示背景和控制面板
+                    # 鼠标进入时取消隐藏定时器，淡入背景并显示控制面板
                     self.hide_timer.stop()
                     self.is_mouse_over = True
-                    self.setStyleSheet("""
-                        QMainWindow {
-                            background-color: rgba(26, 26, 26, 200);
-                        }
-                    """)
-                    self.label_container.setStyleSheet("background-color: rgba(26, 26, 26, 200);")
-                    self.control_panel.show()
+                    self.set_hover(True)
                 elif event.type() == event.Leave:
                     # 延迟检查，确保鼠标真的离开了窗口
                     # 使用定时器延迟100ms检查，避免快速移动时误判
                     self.hide_timer.start(100)
             return super().eventFilter(obj, event)
         except Exception as e:
-            print(f"事件过滤错误: {str(e)}")
+            log.error(f"事件过滤错误: {str(e)}")
             return False
 
+def render_headless(args):
+    """无窗口渲染：在离屏图像上按固定时间步长定位滚动位置，尽可能快地输出每一帧"""
+    # 标准输出可能是视频数据管道，控制台信息改为输出到标准错误
+    output = sys.stdout.buffer if args.render == '-' else None
+    sys.stdout = sys.stderr
+    width, height = args.size
+    container = QWidget()
+    container.resize(width, height)
+    label = LyricLabel(container)
+    label.frame_clock.timer.stop()  # 由下面的循环驱动，不使用定时器
+    font = QFont(label.current_font)
+    if args.font_family:
+        font.setFamily(args.font_family)
+    font.setPointSize(args.font_size)
+    label.set_font(font)
+    label.set_text_color(QColor(args.color))
+    label.set_speed(args.speed)
+    label.update_position()
+    label.load_text_from_file(args.text)
+    if hasattr(label.text_lines, 'wait'):
+        label.text_lines.wait()  # 保证输出与索引建立的快慢无关
+    frame_count = args.frames if args.frames else max(1, round(args.duration * args.fps))
+    image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    if args.render != '-' and args.format == 'png':
+        os.makedirs(args.render, exist_ok=True)
+    elif output is None:
+        output = open(args.render, 'wb')
+    started = time.perf_counter()
+    for frame in range(frame_count):
+        # 每帧直接按时间线定位，不受定时器节奏限制，也可以从任意时间开始
+        label.seek(args.start + frame / args.fps)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        label.paint_content(painter)
+        painter.end()
+        if args.format == 'png':
+            if output is None:
+                image.save(os.path.join(args.render, f'frame_{frame:06d}.png'), 'PNG')
+            else:
+                buffer = QBuffer()
+                buffer.open(QBuffer.WriteOnly)
+                image.save(buffer, 'PNG')
+                output.write(bytes(buffer.data()))
+        else:
+            # 原始RGBA数据（非预乘alpha），可直接作为 ffmpeg -f rawvideo -pix_fmt rgba 的输入
+            frame_image = image.convertToFormat(QImage.Format_RGBA8888)
+            output.write(frame_image.constBits().asstring(frame_image.sizeInBytes()))
+    if output is not None:
+        output.flush()
+        if output is not sys.__stdout__.buffer:
+            output.close()
+    elapsed = time.perf_counter() - started
+    log.info(f"渲染了 {frame_count} 帧（{width}x{height}，{args.fps} FPS），用时 {elapsed:.2f} 秒，"
+          f"相当于实时速度的 {frame_count / args.fps / max(elapsed, 1e-9):.1f} 倍")
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
 if __name__ == '__main__':
     try:
-        app = QApplication(sys.argv)
+        parser = argparse.ArgumentParser(description='直播间滚动字幕广告工具')
+        parser.add_argument('--control-port', type=int, default=None,
+                            help='在 127.0.0.1 的指定端口启动本地控制接口（0 表示自动分配）')
+        parser.add_argument('--shm', nargs='?', const=frame_ring.default_path(), default=None, metavar='PATH',
+                            help='把每帧画面写入共享内存环形缓冲区（默认路径见 frame_ring.py）')
+        parser.add_argument('--lane', action='append', metavar='FILE',
+                            help='添加一条字幕轨道并加载该文本文件，可重复指定（不再弹出文件选择对话框）')
+        parser.add_argument('--profile', metavar='NAME',
+                            help='使用指定配置启动（名称或 .json 路径）：恢复上次的文本文件、字体、颜色、速度和窗口位置，'
+                                 '并使用预热缓存；设置变化后自动保存')
+        sync_group = parser.add_argument_group('多实例同步')
+        sync_group.add_argument('--sync', choices=('leader', 'follower'),
+                                help='leader 发布滚动时钟，follower 跟随主实例滚动')
+        sync_group.add_argument('--sync-address', default=scroll_sync.DEFAULT_ADDRESS,
+                                help='UDP 组播地址或单播地址（如 127.0.0.1:8767）')
+        sync_group.add_argument('--sync-offset', type=float, default=0.0,
+                                help='跟随实例的视口相对主实例视口的水平偏移（像素），'
+                                     '如位于主实例左侧的屏幕填负的主实例窗口宽度')
+        log_group = parser.add_argument_group('日志')
+        log_group.add_argument('--log-level', default='INFO', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'),
+                               help='日志级别；DEBUG 时输出每次行切换和循环（同一位置的日志会被限速）')
+        log_group.add_argument('--log-file', metavar='PATH', help='同时把日志写入文件')
+        log_group.add_argument('--log-json', action='store_true', help='每条日志输出为一行 JSON')
+        stats_group = parser.add_argument_group('帧时间统计')
+        stats_group.add_argument('--stats-file', metavar='PATH', help='定期把帧时间统计写入JSON文件')
+        stats_group.add_argument('--stats-interval', type=float, default=5.0, help='写入统计的间隔（秒）')
+        stats_group.add_argument('--stats-overlay', action='store_true', help='在画面左上角显示调试信息')
+        render_group = parser.add_argument_group('无窗口渲染')
+        render_group.add_argument('--render', metavar='OUTPUT',
+                                  help='不打开窗口，把帧输出到文件、PNG序列目录或标准输出（-）')
+        render_group.add_argument('--text', help='要滚动的文本文件（无窗口渲染时必需）')
+        render_group.add_argument('--format', choices=('rgba', 'png'), default='rgba',
+                                  help='rgba 为原始RGBA数据，png 为PNG序列')
+        render_group.add_argument('--size', type=parse_size, default=(1920, 80), help='画面尺寸，如 1920x80')
+        render_group.add_argument('--fps', type=int, default=60)
+        render_group.add_argument('--duration', type=float, default=10.0, help='渲染时长（秒）')
+        render_group.add_argument('--frames', type=int, default=0, help='渲染帧数，优先于 --duration')
+        render_group.add_argument('--start', type=float, default=0.0, help='从第几秒开始渲染（直接定位，不逐帧推进）')
+        render_group.add_argument('--speed', type=float, default=60.0, help='滚动速度（像素/秒）')
+        render_group.add_argument('--font-family', default=None)
+        render_group.add_argument('--font-size', type=int, default=40)
+        render_group.add_argument('--color', default='#ffffff')
+        # 其余参数（如 -platform）交给 Qt 处理
+        args, qt_args = parser.parse_known_args(sys.argv[1:])
+        ticker_log.setup(args.log_level, args.log_file, args.log_json)
+        if args.render:
+            if not args.text:
+                parser.error('无窗口渲染需要 --text')
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            app = QApplication(sys.argv[:1] + qt_args)
+            render_headless(args)
+            sys.exit(0)
+        app = QApplication(sys.argv[:1] + qt_args)
         # 设置应用程序图标
         icon_path = os.path.join(os.path.dirname(__file__), 'logo', 'favicon.ico')
         if os.path.exists(icon_path):
             app.setWindowIcon(QIcon(icon_path))
-        main_window = MainWindow()
+        main_window = MainWindow(control_port=args.control_port, shm_path=args.shm,
+                                 stats_file=args.stats_file, stats_interval=args.stats_interval,
+                                 stats_overlay=args.stats_overlay, lane_files=args.lane,
+                                 sync_mode=args.sync, sync_address=args.sync_address, sync_offset=args.sync_offset,
+                                 profile_path=startup_profile.profile_path(args.profile) if args.profile else None)
         main_window.show()
         sys.exit(app.exec_())
     except Exception as e:
-        print(f"程序运行错误: {str(e)}")
-        print(traceback.format_exc())
+        log.exception(f"程序运行错误: {str(e)}")
         QMessageBox.critical(None, "错误", f"程序运行失败: {str(e)}")
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""广告轮播调度
+
+按权重、优先级、有效时间段和每小时最多播放次数从广告目录中选出下一条，不按文件顺序轮流。
+每次选择的开销为 O(log n)，不会重新扫描整个目录，适合数万条的目录。本模块不依赖 Qt。
+
+目录文件为 JSON Lines，每行一条广告：
+    {"text": "新品上架限时特价", "weight": 3, "priority": 1,
+     "start": "2026-10-18T08:00:00", "end": "2026-10-31T23:59:59", "max_per_hour": 4}
+除 text 外均可省略：weight 默认 1；priority 默认 0，数值大的优先；start/end 为 ISO 时间或 Unix 时间戳；
+max_per_hour 默认不限。
+
+调度规则：
+    - 只有处在有效时间段内且最近一小时播放次数未达上限的广告参与选择
+    - 参与选择的广告中优先级最高的先播；同一优先级内按权重比例交替播放（步幅调度，
+      每播放一次 pass 增加 1 / weight，总是选 pass 最小的一条）
+    - 尚未开始或达到每小时上限的广告放在等待堆中，到可播放的时间再放回，不参与比较
+"""
+import heapq
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime
+
+HOUR = 3600.0
+RECENT_PICKS = 256  # 记录最近选出的条目数，重新载入期间选出的条目据此补上
+
+log = logging.getLogger(__name__)
+
+
+def parse_time(value):
+    """ISO 时间字符串或 Unix 时间戳转为 Unix 时间戳，None 保持不变"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return datetime.fromisoformat(value).timestamp()
+
+
+def read_catalog(file_path):
+    """读取广告目录，返回条目字典列表；跳过空行和以 # 开头的注释行"""
+    entries = []
+    with open(file_path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                entry = json.loads(line)
+                entries.append({
+                    'text': str(entry['text']).strip(),
+                    'weight': float(entry.get('weight', 1)),
+                    'priority': int(entry.get('priority', 0)),
+                    'start': parse_time(entry.get('start')),
+                    'end': parse_time(entry.get('end')),
+                    'max_per_hour': parse_limit(entry.get('max_per_hour')),
+                })
+            except (ValueError, KeyError, TypeError) as e:
+                log.warning(f"广告目录第 {number} 行无效，已跳过: {e}")
+    return entries
+
+
+def parse_limit(value):
+    """每小时播放上限转为正整数，None 表示不限"""
+    if value is None:
+        return None
+    limit = int(value)
+    if limit < 1:
+        raise ValueError(f"max_per_hour 必须为正整数: {value}")
+    return limit
+
+
+class RotationScheduler:
+    """广告轮播调度器：next() 返回下一条要播放的条目序号"""
+    def __init__(self, entries=(), now=None):
+        self.load(entries, now)
+
+    def load(self, entries, now=None):
+        """载入（或重新载入）目录；文本相同的条目保留原有的播放记录和 pass"""
+        if now is None:
+            now = time.time()
+        previous = {}
+        for index, entry in enumerate(getattr(self, 'entries', [])):
+            previous[entry['text']] = (self.plays[index], self.passes[index])
+        self.entries = list(entries)
+        self.plays = []  # 每条最近一小时内的播放时间
+        self.passes = []  # 每条的步幅调度进度
+        self.virtual_pass = getattr(self, 'virtual_pass', 0.0)  # 最近一次选中条目的 pass
+        self.ready = []  # (-优先级, pass, 序号, 条目序号)
+        self.waiting = []  # (可播放时间, 序号, 条目序号)
+        self.counter = 0  # 堆中同值时按放入顺序排列
+        self.total_plays = getattr(self, 'total_plays', 0)
+        self.recent = deque(maxlen=RECENT_PICKS)  # 最近选出的条目序号
+        self.positions = {}  # 文本 -> 条目序号
+        for index, entry in enumerate(self.entries):
+            plays, pass_value = previous.get(entry['text'], (deque(), self.virtual_pass))
+            self.plays.append(plays)
+            self.passes.append(pass_value)
+            self.positions[entry['text']] = index
+            self._schedule(index, now)
+
+    def reloaded(self, entries, now=None):
+        """按新目录建立一个新的调度器，文本相同的条目沿用本调度器的播放记录和 pass
+
+        不修改本调度器，可以在后台线程中调用；建立期间本调度器又选出的条目，
+        之后在界面线程中由新调度器的 catch_up() 补上。
+        """
+        scheduler = RotationScheduler.__new__(RotationScheduler)
+        # 先读取计数再复制状态，复制期间选出的条目也会被补上（重复补上没有影响）
+        scheduler.total_plays = self.total_plays
+        scheduler.entries = list(self.entries)
+        scheduler.plays = [deque(plays) for plays in self.plays]
+        scheduler.passes = list(self.passes)
+        scheduler.virtual_pass = self.virtual_pass
+        scheduler.load(entries, now)
+        return scheduler
+
+    def catch_up(self, previous, now=None):
+        """补上由 previous.reloaded() 建立本调度器期间 previous 选出的条目；
+        期间选出的条目超过记录的数量时不修改并返回 False"""
+        count = previous.total_plays - self.total_plays
+        if count > len(previous.recent):
+            return False
+        if now is None:
+            now = time.time()
+        for old_index in list(previous.recent)[len(previous.recent) - count:]:
+            index = self.positions.get(previous.entries[old_index]['text'])
+            if index is None:
+                continue
+            self.plays[index] = deque(previous.plays[old_index])
+            self.passes[index] = previous.passes[old_index]
+            # 堆中原来的一项 pass 已过时，next() 取出时跳过
+            self._schedule(index, now)
+        self.virtual_pass = max(self.virtual_pass, previous.virtual_pass)
+        self.total_plays = previous.total_plays
+        self.recent = deque(previous.recent, maxlen=RECENT_PICKS)
+        return True
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _push_ready(self, index):
+        self.counter += 1
+        heapq.heappush(self.ready, (-self.entries[index]['priority'], self.passes[index], self.counter, index))
+
+    def _push_waiting(self, index, available):
+        self.counter += 1
+        heapq.heappush(self.waiting, (available, self.counter, index))
+
+    def _schedule(self, index, now):
+        """按有效时间段和每小时上限把条目放入可选堆或等待堆；已过期的条目不再放回"""
+        entry = self.entries[index]
+        if entry['end'] is not None and now > entry['end']:
+            return
+        if entry['start'] is not None and now < entry['start']:
+            self._push_waiting(index, entry['start'])
+            return
+        plays = self.plays[index]
+        while plays and plays[0] <= now - HOUR:
+            plays.popleft()
+        limit = entry['max_per_hour']
+        if limit is not None and len(plays) >= limit:
+            # 最早的一次播放满一小时后才能再播
+            self._push_waiting(index, plays[0] + HOUR)
+            return
+        self._push_ready(index)
+
+    def _release(self, now):
+        """把已到可播放时间的条目移回可选堆"""
+        while self.waiting and self.waiting[0][0] <= now:
+            _, _, index = heapq.heappop(self.waiting)
+            # 等待期间不累积欠账，回到当前进度，避免回来后连续播放
+            self.passes[index] = max(self.passes[index], self.virtual_pass)
+            self._schedule(index, now)
+
+    def next(self, now=None):
+        """选出下一条并记一次播放；当前没有可播放的条目时返回 None"""
+        if now is None:
+            now = time.time()
+        self._release(now)
+        while self.ready:
+            _, pass_value, _, index = heapq.heappop(self.ready)
+            if pass_value != self.passes[index]:
+                continue  # 重新载入后补上的条目留下的过时项
+            entry = self.entries[index]
+            if entry['end'] is not None and now > entry['end']:
+                continue  # 已过期，丢弃
+            self.virtual_pass = pass_value
+            self.passes[index] = pass_value + 1 / max(entry['weight'], 1e-9)
+            self.plays[index].append(now)
+            self.total_plays += 1
+            self.recent.append(index)
+            self._schedule(index, now)
+            return index
+        return None
@@ -0,0 +1,108 @@
+"""多实例滚动同步
+
+主实例定期通过 UDP（默认本地组播，也可以是 127.0.0.1 单播）发布每条轨道的周期起点和速度，
+跟随实例由这个共享时钟直接算出应处的滚动位置，并平滑修正自身的漂移。
+同一段广告在两块屏幕或局域网内两台机器上滚动时，滚出一块屏幕的行会在下一块屏幕的正确像素处出现。
+本模块不依赖 Qt。
+
+消息为一行 JSON：
+    {"version": 1, "sequence": 序号, "lanes": [{"epoch": 滚动位置为0时的系统时间（秒）,
+     "speed": 像素/秒, "layout_width": 行间距（主实例的视口宽度）, "cycle_spacing": 轮次间距}, ...]}
+
+时间使用 time.time()，跨机器同步时各机器需开启网络时间同步（NTP）。
+"""
+import json
+import socket
+import struct
+import time
+
+VERSION = 1
+DEFAULT_ADDRESS = '239.255.77.1:8767'
+
+
+def parse_address(text):
+    """把 '主机:端口' 解析为 (主机, 端口)"""
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def is_multicast(host):
+    try:
+        return 224 <= int(host.split('.')[0]) <= 239
+    except ValueError:
+        return False
+
+
+def lane_state(position, speed, layout_width, cycle_spacing, now=None):
+    """由主实例当前的滚动位置算出周期起点，组成一条轨道的同步状态"""
+    if now is None:
+        now = time.time()
+    return {'epoch': now - position / speed if speed else now, 'speed': speed,
+            'layout_width': layout_width, 'cycle_spacing': cycle_spacing}
+
+
+def target_position(state, now=None, offset=0.0):
+    """跟随实例在时间now应处的滚动位置（未折回）；offset 为本屏幕视口相对主实例视口的水平偏移"""
+    if now is None:
+        now = time.time()
+    return (now - state['epoch']) * state['speed'] + offset
+
+
+class SyncPublisher:
+    """主实例：发送同步状态"""
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = parse_address(address)
+        self.sequence = 0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if is_multicast(self.address[0]):
+            # 只在本网段内传播，并让本机的跟随实例也能收到
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+
+    def publish(self, lanes):
+        self.sequence += 1
+        message = {'version': VERSION, 'sequence': self.sequence, 'lanes': lanes}
+        self.socket.sendto(json.dumps(message).encode('utf-8'), self.address)
+
+    def close(self):
+        self.socket.close()
+
+
+class SyncListener:
+    """跟随实例：非阻塞接收同步状态，由界面线程每帧调用 poll() 取最新一条"""
+    def __init__(self, address=DEFAULT_ADDRESS):
+        host, port = parse_address(address)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if is_multicast(host):
+            # 同一台机器上可以运行多个跟随实例
+            self.socket.bind(('', port))
+            membership = struct.pack('4s4s', socket.inet_aton(host), socket.inet_aton('0.0.0.0'))
+            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        else:
+            self.socket.bind((host, port))
+        self.socket.setblocking(False)
+        self.sequence = 0
+
+    def poll(self):
+        """取出已到达的全部消息，返回最新一条的轨道状态列表；没有新消息时返回 None"""
+        latest = None
+        while True:
+            try:
+                data = self.socket.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return latest
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            if message.get('version') != VERSION:
+                continue
+            # 主实例重启后序号从头开始，只丢弃明显乱序的旧消息
+            if self.sequence - 100 < message['sequence'] <= self.sequence:
+                continue
+            self.sequence = message['sequence']
+            latest = message['lanes']
+
+    def close(self):
+        self.socket.close()
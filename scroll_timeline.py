@@ -0,0 +1,186 @@
+"""滚动时间线模型
+
+把所有文本行排布到一条虚拟滚动带上，由行宽直接算出每行进入、离开视口的位置和时间
+以及一整轮的长度。给定任意时间戳即可得到可见的行段和x坐标，不需要逐帧推进；
+也可以一次计算大量时间戳（安装了 NumPy 时向量化计算）。本模块不依赖 Qt。
+
+坐标约定：
+    滚动位置 position 是视口左边界在滚动带上的坐标，行 i 在屏幕上的 x = starts[i] - position。
+    时间 t（秒）对应的位置为 origin + speed * t，origin 默认是 -viewport_width，
+    即 t=0 时第一行的左边缘正好位于视口右边界。
+"""
+from array import array
+from bisect import bisect_right
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ScrollTimeline:
+    """行与行之间留出一个视口宽度（上一行完全离开后下一行从右侧进入），
+    最后一行之后只留 cycle_spacing，第一行紧接着开始新一轮。
+    行可以按滚动进度逐步追加，全部追加完并调用 finish() 后才会首尾衔接。
+    """
+    def __init__(self, viewport_width=0.0):
+        self.reset(viewport_width)
+
+    def reset(self, viewport_width=None):
+        if viewport_width is not None:
+            self.viewport_width = float(viewport_width)
+        self.starts = array('d')  # 每行在滚动带上的起点
+        self.ends = array('d')  # 每行在滚动带上的终点（起点 + 行宽）
+        self.next_start = 0.0  # 下一行的起点
+        self.cycle_length = 0.0  # 一整轮的长度，finish() 之前为0
+        self.complete = False
+
+    def append(self, width):
+        self.starts.append(self.next_start)
+        self.ends.append(self.next_start + width)
+        self.next_start += width + self.viewport_width
+
+    def finish(self, cycle_spacing):
+        """所有行已追加，最后一行之后只留轮次间距，第一行紧接着开始新一轮"""
+        if self.ends:
+            self.cycle_length = self.ends[-1] + cycle_spacing
+        self.complete = True
+
+    def rebuild(self, widths, viewport_width, cycle_spacing):
+        self.reset(viewport_width)
+        for width in widths:
+            self.append(width)
+        self.finish(cycle_spacing)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def drop_front(self, count):
+        """丢弃最前面的count行，其余行平移到从0开始，返回平移的距离（用于不断追加、不会折回的滚动带）"""
+        shift = self.starts[count] if count < len(self.starts) else self.next_start
+        self.starts = array('d', (start - shift for start in self.starts[count:]))
+        self.ends = array('d', (end - shift for end in self.ends[count:]))
+        self.next_start -= shift
+        return shift
+
+    def normalize(self, position):
+        """把滚动位置折回到一轮之内；负数表示第一行尚未从右侧进入，保持不变"""
+        if self.cycle_length > 0 and position >= self.cycle_length:
+            return position % self.cycle_length
+        return position
+
+    def origin(self):
+        """时间0对应的滚动位置：第一行的左边缘位于视口右边界"""
+        return -self.viewport_width
+
+    def position_at(self, time, speed, origin=None):
+        """时间time（秒）时的滚动位置，已折回到一轮之内"""
+        if origin is None:
+            origin = self.origin()
+        return self.normalize(origin + speed * time)
+
+    def enter_position(self, index):
+        """行的左边缘到达视口右边界时的滚动位置"""
+        return self.starts[index] - self.viewport_width
+
+    def exit_position(self, index):
+        """行的右边缘离开视口左边界时的滚动位置"""
+        return self.ends[index]
+
+    def enter_time(self, index, speed, origin=None):
+        """第一轮中该行开始进入视口的时间（秒），之后每隔 cycle_time() 重复一次"""
+        if origin is None:
+            origin = self.origin()
+        return (self.enter_position(index) - origin) / speed
+
+    def exit_time(self, index, speed, origin=None):
+        """第一轮中该行完全离开视口的时间（秒）"""
+        if origin is None:
+            origin = self.origin()
+        return (self.exit_position(index) - origin) / speed
+
+    def cycle_time(self, speed):
+        """一整轮的时长（秒），未排布完时为0"""
+        return self.cycle_length / speed if speed > 0 else 0.0
+
+    def visible_segments(self, position, viewport_width=None):
+        """返回可见窗口 [position, position + viewport_width) 内的 (行号, x坐标) 列表"""
+        if viewport_width is None:
+            viewport_width = self.viewport_width
+        count = len(self.starts)
+        if not count or (self.complete and self.cycle_length <= 0):
+            return []
+        position = self.normalize(position)
+        # 第一段是终点落在窗口左边界右侧的行，二分查找定位
+        index = bisect_right(self.ends, position)
+        shift = 0.0
+        segments = []
+        while True:
+            if index == count:
+                if not self.complete:
+                    break  # 后面的行还没有排布
+                # 越过最后一行，回到第一行（下一轮）
+                index = 0
+                shift += self.cycle_length
+            x = self.starts[index] + shift - position
+            if x >= viewport_width:
+                break
+            segments.append((index, x))
+            index += 1
+        return segments
+
+    def segments_at(self, time, speed, origin=None, viewport_width=None):
+        """时间time（秒）时可见的 (行号, x坐标) 列表"""
+        return self.visible_segments(self.position_at(time, speed, origin), viewport_width)
+
+    def positions_at(self, times, speed, origin=None):
+        """批量计算多个时间戳的滚动位置（已折回到一轮之内）"""
+        if origin is None:
+            origin = self.origin()
+        if np is None:
+            return [self.normalize(origin + speed * time) for time in times]
+        positions = origin + speed * np.asarray(times, dtype=np.float64)
+        if self.cycle_length > 0:
+            positions = np.where(positions >= self.cycle_length, positions % self.cycle_length, positions)
+        return positions
+
+    def evaluate(self, times, speed, origin=None):
+        """批量计算多个时间戳，返回 (滚动位置, 最左侧行号, 该行x坐标) 三个序列
+
+        最左侧行是终点落在视口左边界右侧的第一行；尚未排布到的位置行号为 -1。
+        安装了 NumPy 时返回 ndarray 并向量化计算，否则返回列表。
+        """
+        positions = self.positions_at(times, speed, origin)
+        count = len(self.starts)
+        if np is None:
+            lines = []
+            xs = []
+            for position in positions:
+                index = bisect_right(self.ends, position)
+                if index < count:
+                    lines.append(index)
+                    xs.append(self.starts[index] - position)
+                elif self.complete and count:
+                    lines.append(0)
+                    xs.append(self.starts[0] + self.cycle_length - position)
+                else:
+                    lines.append(-1)
+                    xs.append(float('nan'))
+            return positions, lines, xs
+        starts = np.frombuffer(self.starts, dtype=np.float64) if count else np.zeros(1)
+        ends = np.frombuffer(self.ends, dtype=np.float64)
+        lines = np.searchsorted(ends, positions, side='right')
+        wrapped = lines >= count
+        xs = starts[np.minimum(lines, max(count - 1, 0))] - positions
+        if self.complete and count:
+            xs = np.where(wrapped, starts[0] + self.cycle_length - positions, xs)
+            lines = np.where(wrapped, 0, lines)
+        else:
+            xs = np.where(wrapped, np.nan, xs)
+            lines = np.where(wrapped, -1, lines)
+        return positions, lines, xs
+
+    def segments_for_times(self, times, speed, origin=None, viewport_width=None):
+        """批量计算多个时间戳的可见行段，返回与times等长的列表"""
+        positions = self.positions_at(times, speed, origin)
+        return [self.visible_segments(float(position), viewport_width) for position in positions]
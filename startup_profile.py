@@ -0,0 +1,227 @@
+"""启动配置和预热缓存
+
+配置（profile）保存文本文件路径、字体、字号、颜色、速度、轮次间距和窗口位置，
+用 --profile 选择后启动时直接恢复，不再弹出文件选择对话框；直播中崩溃后重启即可继续滚动。
+
+预热缓存按文件内容哈希和字体保存文本行的测量结果，以及第一行最先进入视口的几个分块位图（PNG），
+内容或字体变化后自然失效。本模块不依赖 Qt，位图的编码和解码由调用方完成。
+
+配置文件为 JSON：
+    {"version": 1, "window": {"x": 100, "y": 800}, "selected_lane": 0,
+     "lanes": [{"file": "ads.txt", "font": "Microsoft YaHei,40,...", "font_size": 40,
+                "color": "#ffffffff", "speed": 60.0, "cycle_spacing": 50}]}
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import struct
+from array import array
+
+VERSION = 1
+HOME = os.path.join(os.path.expanduser('~'), '.live_ticker')
+METRICS_HEADER = struct.Struct('<4siqq')  # 标记、行高、文件行数、已测量行数
+METRICS_MAGIC = b'TKM2'
+MAX_CACHE_ENTRIES = 32  # 预热缓存最多保留的条目数（按最近使用淘汰）
+
+log = logging.getLogger(__name__)
+
+
+def profile_path(name):
+    """配置名转为文件路径：带目录或 .json 后缀的按路径处理，否则保存在 ~/.live_ticker/profiles/ 下"""
+    if name.endswith('.json') or os.sep in name or (os.altsep and os.altsep in name):
+        return os.path.abspath(name)
+    return os.path.join(HOME, 'profiles', name + '.json')
+
+
+# 轨道设置各字段的检查：转换函数和取值条件；不满足的字段丢弃，使用默认值
+LANE_FIELDS = {
+    'file': (str, lambda value: bool(value)),
+    'font': (str, lambda value: bool(value)),
+    'font_size': (int, lambda value: 1 <= value <= 500),
+    'color': (str, lambda value: bool(value)),
+    'speed': (float, lambda value: 0 < value < 100000),
+    'cycle_spacing': (int, lambda value: 0 <= value <= 100000),
+}
+
+
+def check_field(value, convert, valid):
+    """按类型转换并检查字段，返回转换后的值；不合法时返回 None"""
+    if isinstance(value, bool) or isinstance(value, (dict, list)):
+        return None
+    if convert is str and not isinstance(value, str):
+        return None
+    try:
+        value = convert(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return value if valid(value) else None
+
+
+def check_profile(profile, path):
+    """逐项检查配置，不合法的字段丢弃并使用默认值，手工编辑出错时仍能无人值守地启动"""
+    checked = {'version': VERSION}
+    window = profile.get('window')
+    if isinstance(window, dict):
+        x = check_field(window.get('x'), int, lambda value: abs(value) < 1000000)
+        y = check_field(window.get('y'), int, lambda value: abs(value) < 1000000)
+        if x is not None and y is not None:
+            checked['window'] = {'x': x, 'y': y}
+    if 'window' in profile and 'window' not in checked:
+        log.warning(f"配置 {path} 中的窗口位置无效，使用默认位置")
+    lanes = profile.get('lanes')
+    if lanes is not None and not isinstance(lanes, list):
+        log.warning(f"配置 {path} 中的 lanes 不是列表，已忽略")
+        lanes = None
+    checked_lanes = []
+    for number, lane in enumerate(lanes or [], 1):
+        if not isinstance(lane, dict):
+            log.warning(f"配置 {path} 中的第 {number} 条轨道无效，已忽略")
+            continue
+        settings = {}
+        for name, (convert, valid) in LANE_FIELDS.items():
+            if lane.get(name) is None:
+                continue
+            value = check_field(lane[name], convert, valid)
+            if value is None:
+                log.warning(f"配置 {path} 中第 {number} 条轨道的 {name} 无效（{lane[name]!r}），使用默认值")
+            else:
+                settings[name] = value
+        checked_lanes.append(settings)
+    if lanes is not None:
+        checked['lanes'] = checked_lanes
+    if 'selected_lane' in profile:
+        selected = check_field(profile['selected_lane'], int, lambda value: 0 <= value < len(checked_lanes))
+        if selected is None:
+            log.warning(f"配置 {path} 中的 selected_lane 无效，选中第一条轨道")
+        else:
+            checked['selected_lane'] = selected
+    return checked
+
+
+def load_profile(path):
+    """读取配置并逐项检查；不存在或无法解析时返回空配置"""
+    try:
+        with open(path, encoding='utf-8') as file:
+            profile = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log.warning(f"读取配置 {path} 错误，使用默认设置: {e}")
+        return {}
+    if not isinstance(profile, dict) or profile.get('version') != VERSION:
+        log.warning(f"配置 {path} 的版本不匹配，使用默认设置")
+        return {}
+    return check_profile(profile, path)
+
+
+def save_profile(path, profile):
+    """写入配置（先写临时文件再替换，崩溃时不会留下半个文件）"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(dict(profile, version=VERSION), file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+class ContentKey:
+    """边读边计算的内容键：依次 update() 文件的各段内容，result() 返回 (哈希, 行数)"""
+    def __init__(self):
+        self.digest = hashlib.blake2b(digest_size=16)
+        self.lines = 0
+        self.last = b'\n'
+
+    def update(self, chunk):
+        self.digest.update(chunk)
+        self.lines += chunk.count(b'\n')
+        if chunk:
+            self.last = chunk[-1:]
+
+    def result(self):
+        # 最后一行没有换行符时也算一行
+        return self.digest.hexdigest(), self.lines + (self.last != b'\n')
+
+
+def content_key(file_path, chunk_size=1024 * 1024):
+    """文件内容的 (哈希, 行数)：哈希作为预热缓存的键，行数用于核对缓存的测量结果"""
+    key = ContentKey()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            key.update(chunk)
+    return key.result()
+
+
+class WarmCache:
+    """按（文件内容, 字体）保存的预热缓存，每个条目是缓存目录下的一个子目录"""
+    def __init__(self, directory=os.path.join(HOME, 'cache'), max_entries=MAX_CACHE_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def entry(self, content_key, font_key):
+        name = hashlib.blake2b(f'{content_key}\n{font_key}'.encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def load_metrics(self, entry):
+        """读取测量结果，返回 (行高, 文件行数, 宽度数组, 高度数组)；没有缓存或文件损坏时返回 None"""
+        try:
+            with open(os.path.join(entry, 'metrics.bin'), 'rb') as file:
+                magic, line_height, line_count, count = METRICS_HEADER.unpack(file.read(METRICS_HEADER.size))
+                if magic != METRICS_MAGIC:
+                    return None
+                widths = array('i')
+                heights = array('i')
+                widths.fromfile(file, count)
+                heights.fromfile(file, count)
+        except (OSError, EOFError, struct.error):
+            return None
+        os.utime(entry)  # 记录最近使用时间，淘汰时保留常用的条目
+        return line_height, line_count, widths, heights
+
+    def save_metrics(self, entry, line_height, line_count, widths, heights):
+        os.makedirs(entry, exist_ok=True)
+        path = os.path.join(entry, 'metrics.bin')
+        with open(path + '.tmp', 'wb') as file:
+            file.write(METRICS_HEADER.pack(METRICS_MAGIC, line_height, line_count, len(widths)))
+            widths.tofile(file)
+            heights.tofile(file)
+        os.replace(path + '.tmp', path)
+        self.prune()
+
+    def load_tiles(self, entry):
+        """读取分块清单：[{"text", "tile", "color", "ratio", "file"}]，file 为 PNG 的完整路径"""
+        try:
+            with open(os.path.join(entry, 'tiles.json'), encoding='utf-8') as file:
+                tiles = json.load(file)
+        except (OSError, ValueError):
+            return []
+        for tile in tiles:
+            tile['file'] = os.path.join(entry, tile['file'])
+        return tiles
+
+    def save_tiles(self, entry, tiles):
+        """保存分块：tiles 为 [(文本, 分块序号, 颜色, 设备像素比, PNG字节)]"""
+        os.makedirs(entry, exist_ok=True)
+        manifest = []
+        for number, (text, tile, color, ratio, data) in enumerate(tiles):
+            name = f'tile_{number}.png'
+            with open(os.path.join(entry, name), 'wb') as file:
+                file.write(data)
+            manifest.append({'text': text, 'tile': tile, 'color': color, 'ratio': ratio, 'file': name})
+        path = os.path.join(entry, 'tiles.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def prune(self):
+        """条目超过上限时删除最久未使用的条目"""
+        try:
+            entries = [os.path.join(self.directory, name) for name in os.listdir(self.directory)]
+        except OSError:
+            return
+        entries = [path for path in entries if os.path.isdir(path)]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.max_entries]:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,80 @@
+"""带样式的广告文本
+
+文本行中可以用简单的标记给部分文字设置颜色、粗体或指定字体（如 emoji 使用彩色字体）：
+    欢迎 [color=#ffcc00][b]某某品牌[/b][/color] 赞助本场直播 [font=Segoe UI Emoji]🎉[/font]
+标记可以嵌套；未闭合的标记作用到行尾；[[ 表示字面的 [。不认识的标记按原样显示。
+
+每行只解析一次（结果有缓存），得到样式相同的连续文字片段（Run）。本模块不依赖 Qt，
+片段的排版和绘制由调用方完成。
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# 一段样式相同的文字；color 为颜色名（如 #ffcc00），None 表示使用轨道的文字颜色；family 为 None 表示使用轨道的字体
+Run = namedtuple('Run', 'text color bold family')
+
+TAG = re.compile(r'\[\[|\[(/?)(b|color|font)(?:=([^\]]+))?\]')
+PARSE_CACHE_SIZE = 4096
+
+
+def has_markup(text):
+    """是否包含样式标记；不含标记的行按普通文本测量和绘制"""
+    return '[' in text and TAG.search(text) is not None
+
+
+def line_runs(text):
+    """一行的样式片段；不含标记的行整行作为一个默认样式的片段，不占用解析缓存"""
+    if not has_markup(text):
+        return (Run(text, None, False, None),)
+    return parse_runs(text)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_runs(text):
+    """把一行文本解析为样式片段元组，相邻的同样式文字合并为一个片段"""
+    runs = []
+    stack = [('', None, False, None)]  # (标记名, 颜色, 粗体, 字体)
+    buffer = []
+    position = 0
+
+    def flush():
+        chunk = ''.join(buffer)
+        buffer.clear()
+        if not chunk:
+            return
+        _, color, bold, family = stack[-1]
+        if runs and runs[-1][1:] == (color, bold, family):
+            runs[-1] = Run(runs[-1].text + chunk, color, bold, family)
+        else:
+            runs.append(Run(chunk, color, bold, family))
+
+    for match in TAG.finditer(text):
+        buffer.append(text[position:match.start()])
+        position = match.end()
+        if match.group(0) == '[[':
+            buffer.append('[')
+            continue
+        closing, name, value = match.groups()
+        _, color, bold, family = stack[-1]
+        if closing:
+            if value is not None or stack[-1][0] != name:
+                buffer.append(match.group(0))  # 与最近打开的标记不匹配，按原样显示
+                continue
+            flush()
+            stack.pop()
+            continue
+        if name == 'b' and value is None:
+            style = (name, color, True, family)
+        elif name == 'color' and value:
+            style = (name, value.strip(), bold, family)
+        elif name == 'font' and value:
+            style = (name, color, bold, value.strip())
+        else:
+            buffer.append(match.group(0))
+            continue
+        flush()
+        stack.append(style)
+    buffer.append(text[position:])
+    flush()
+    return tuple(runs)
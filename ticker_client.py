@@ -0,0 +1,31 @@
+import argparse
+import json
+import socket
+import sys
+
+
+def send_commands(commands, host='127.0.0.1', port=8765):
+    """把命令逐行发送到本地控制接口，返回每条命令的回复"""
+    replies = []
+    with socket.create_connection((host, port), timeout=5) as connection:
+        stream = connection.makefile('rwb')
+        for command in commands:
+            stream.write((json.dumps(command, ensure_ascii=False) + '\n').encode('utf-8'))
+            stream.flush()
+            replies.append(json.loads(stream.readline()))
+    return replies
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='直播间滚动字幕广告工具 - 本地控制接口测试客户端')
+    parser.add_argument('commands', nargs='+',
+                        help='JSON 格式的命令，例如 \'{"cmd": "add_line", "text": "新品上架"}\'')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    try:
+        for reply in send_commands([json.loads(command) for command in args.commands], args.host, args.port):
+            print(json.dumps(reply, ensure_ascii=False))
+    except Exception as e:
+        print(f"发送命令错误: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,122 @@
+"""结构化日志
+
+日志记录在调用线程中只经过限速判断后放入队列，格式化和写入控制台、文件由后台线程完成，
+Windows 控制台或重定向的日志文件写得慢时不会拖慢滚动的定时器。本模块不依赖 Qt。
+
+    - 每个调用位置（文件和行号）在 interval 秒内最多输出 burst 条，其余只计数，
+      下一条输出时附上省略的条数；同一个错误每帧出现时日志量也保持不变
+    - 附加字段通过 extra={'fields': {...}} 传入，文本格式输出为 key=value，JSON 格式为同一对象中的键
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+RATE_INTERVAL = 10.0  # 限速窗口（秒）
+RATE_BURST = 10  # 每个调用位置在一个窗口内最多输出的条数
+
+
+class RateLimitFilter(logging.Filter):
+    """按调用位置限速，被丢弃的记录只计数"""
+    def __init__(self, interval=RATE_INTERVAL, burst=RATE_BURST):
+        super(RateLimitFilter, self).__init__()
+        self.interval = interval
+        self.burst = burst
+        self.windows = {}  # (文件, 行号) -> [窗口开始时间, 已输出条数, 省略条数]
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.pathname, record.lineno)
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or record.created - window[0] >= self.interval:
+                record.suppressed = window[2] if window else 0
+                self.windows[key] = [record.created, 1, 0]
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                record.suppressed = 0
+                return True
+            window[2] += 1
+            return False
+
+    def pending_records(self):
+        """各位置在最后一个窗口内省略、尚未报告的条数，生成为日志记录（程序退出时输出）"""
+        with self.lock:
+            pending = [(key, window[2]) for key, window in self.windows.items() if window[2]]
+            for window in self.windows.values():
+                window[2] = 0
+        return [logging.makeLogRecord({'name': __name__, 'levelno': logging.INFO, 'levelname': 'INFO',
+                                       'msg': f'{os.path.basename(path)}:{line} 的日志省略了 {count} 条'})
+                for (path, line), count in pending]
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """只把记录放入队列；格式化留给后台线程，这里只固定消息和异常文本"""
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """文本格式：时间 级别 日志名: 消息 key=value；JSON 格式：每条一行 JSON"""
+    def __init__(self, json_format=False):
+        super(StructuredFormatter, self).__init__()
+        self.json_format = json_format
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+        suppressed = getattr(record, 'suppressed', 0)
+        if self.json_format:
+            data = {'time': round(record.created, 3), 'level': record.levelname, 'logger': record.name,
+                    'message': record.getMessage()}
+            data.update(fields)
+            if suppressed:
+                data['suppressed'] = suppressed
+            if record.exc_text:
+                data['exception'] = record.exc_text
+            return json.dumps(data, ensure_ascii=False, default=str)
+        text = f"{self.formatTime(record)} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if fields:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if suppressed:
+            text += f'（此前省略了 {suppressed} 条同一位置的日志）'
+        if record.exc_text:
+            text += '\n' + record.exc_text
+        return text
+
+
+def setup(level='INFO', log_file=None, json_format=False, interval=RATE_INTERVAL, burst=RATE_BURST):
+    """配置根日志：限速后放入队列，由后台线程写入标准错误和可选的日志文件；程序退出时写完队列中的记录"""
+    formatter = StructuredFormatter(json_format)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    queue_handler = BackgroundQueueHandler(log_queue)
+    rate_filter = RateLimitFilter(interval, burst)
+    queue_handler.addFilter(rate_filter)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener = QueueListener(log_queue, *handlers)
+    listener.start()
+
+    def flush():
+        for record in rate_filter.pending_records():
+            log_queue.put(record)
+        listener.stop()
+    atexit.register(flush)
+    return listener